@@ -5,21 +5,22 @@ These handlers catch exceptions and return consistent JSON error responses.
 FastAPI automatically routes exceptions to the appropriate handler based on exception type.
 """
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 
+from api.responses import ORJSONResponse
 
-async def validation_exception_handler(request: Request, exc: RequestValidationError) -> JSONResponse:
+
+async def validation_exception_handler(request: Request, exc: RequestValidationError) -> ORJSONResponse:
     """
     Handle validation errors (invalid request data).
     
     This is triggered when FastAPI's automatic validation fails (e.g., wrong data types,
     missing required fields, invalid enum values). Returns 422 Unprocessable Entity.
     """
-    return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": exc.errors()})
+    return ORJSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": exc.errors()})
 
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
     """
     Handle unexpected exceptions (catch-all for any unhandled errors).
     
@@ -27,7 +28,7 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
     Logs the full error with stack trace for debugging, but returns a simple
     error message to the client (for security - don't expose internal details).
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": str(exc)}
     )
@@ -0,0 +1,18 @@
+"""
+Reusable parameter types shared by the API routers.
+"""
+from typing import Annotated, Optional
+
+from fastapi import Path, Query
+
+# Largest integer SQLite can store; bigger values would fail when bound.
+SQLITE_MAX_INTEGER = 2**63 - 1
+
+# Row ID taken from the URL path. The range check is done by pydantic-core
+# during request parsing, so handlers get an ID that SQLite can always bind
+# (out-of-range IDs are rejected with a 422 before any query runs).
+PathId = Annotated[int, Path(ge=1, le=SQLITE_MAX_INTEGER)]
+
+# Same range check for row IDs passed as query parameters
+QueryId = Annotated[int, Query(ge=1, le=SQLITE_MAX_INTEGER)]
+OptionalQueryId = Annotated[Optional[int], Query(ge=1, le=SQLITE_MAX_INTEGER)]
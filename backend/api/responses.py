@@ -0,0 +1,24 @@
+"""
+Response classes shared by the API routers.
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson instead of the stdlib json encoder.
+
+    orjson is a compiled extension and encodes several times faster. Returning
+    this class directly from an endpoint also skips FastAPI's jsonable_encoder
+    pass, so content must already be plain dicts/lists/scalars (not Rows).
+
+    Defined locally because fastapi.responses.ORJSONResponse is deprecated in
+    newer FastAPI releases.
+    """
+
+    def render(self, content: Any) -> bytes:
+        # OPT_NON_STR_KEYS allows int keys (e.g. {image_id: counts})
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -19,10 +19,13 @@ uploaded multiple times only stores one copy.
 
 from typing import List, Optional
 import asyncio 
+import os
+import time
+import weakref
 from datetime import datetime, timezone
 from pathlib import Path
 from fastapi import APIRouter, HTTPException, UploadFile, File #fastapi is the module we use to create the API that javascript can talk to
-from db import get_db #for sql
+from db import get_db, get_data_version #for sql
 from utils.collection_utils import (
     get_collection,
     get_all_collections,
@@ -32,24 +35,89 @@ from utils.collection_utils import (
     get_all_runs,
     remove_image_from_collection,
 ) #functions imported from our utils folder to do sql logic
-from utils.detection_counts import get_counts_by_image_for_run
+from utils.detection_counts import update_counts_for_run
 from utils.image_utils import add_multiple_images_optimized
-from utils.file_processing import process_single_file
+from utils.file_processing import store_upload, stream_upload
+from api.responses import ORJSONResponse
+from api.params import PathId, QueryId, OptionalQueryId
 
 # Create router with prefix - all endpoints will be under /api/collections
 router = APIRouter(prefix="/api/collections", tags=["collections"])
 
 
-def _delete_file_if_exists(file_path: Optional[str]) -> None:
+# Short-lived cache of collection IDs known to exist, so handlers that only
+# need a 404 check can skip the lookup query. Only hits are cached, and
+# entries are dropped when a collection is deleted.
+_COLLECTION_EXISTS_TTL = 5.0  # seconds
+_COLLECTION_EXISTS_MAX_ENTRIES = 1024
+_collection_exists_cache: dict[int, float] = {}
+
+
+async def _collection_exists(db, collection_id: int) -> bool:
+    """
+    Return True if the collection exists, consulting the TTL cache first.
+    """
+    cached_at = _collection_exists_cache.get(collection_id)
+    if cached_at is not None and time.monotonic() - cached_at < _COLLECTION_EXISTS_TTL:
+        return True
+
+    if not await db.execute_fetchall(
+        "SELECT 1 FROM collection WHERE collection_id = ?",
+        (collection_id,)
+    ):
+        _collection_exists_cache.pop(collection_id, None)
+        return False
+
+    if len(_collection_exists_cache) >= _COLLECTION_EXISTS_MAX_ENTRIES:
+        _collection_exists_cache.clear()
+    _collection_exists_cache[collection_id] = time.monotonic()
+    return True
+
+
+# SQL used by recalculate_threshold_endpoint
+_SQL_RECALC_LATEST_RUN = """
+    SELECT run_id FROM run
+    WHERE collection_id = ? AND model_id = ?
+    ORDER BY run_id DESC LIMIT 1
+"""
+_SQL_RECALC_SELECT_COUNTS = """
+    SELECT image_id, live_mussel_count, dead_mussel_count
+    FROM image_result
+    WHERE run_id = ?
+"""
+_SQL_RECALC_UPDATE_RUN = """
+    UPDATE run
+    SET threshold = ?,
+        live_mussel_count = ?
+    WHERE run_id = ?
+"""
+
+
+# Files streamed/hashed concurrently per upload. The work is thread-pool I/O
+# (memory is O(chunk) per file), so allow more than one per core.
+_UPLOAD_CONCURRENCY = min(32, (os.cpu_count() or 1) * 4)
+
+# Collection detail payloads, cached per reader connection. PRAGMA data_version
+# is per-connection and changes whenever another connection commits, so an
+# entry is only reused while its reader has seen no writes since it was built.
+# Weak keys drop a connection's entries once it is closed.
+_COLLECTION_PAYLOAD_MAX_ENTRIES = 256
+_collection_payload_cache: "weakref.WeakKeyDictionary[object, dict]" = weakref.WeakKeyDictionary()
+
+
+def _delete_files_if_exist(file_paths: List[Optional[str]]) -> None:
     """
     Best-effort file cleanup for orphaned images.
+
+    Call through asyncio.to_thread so the unlinks stay off the event loop.
     """
-    if not file_path:
-        return
-    try:
-        Path(file_path).unlink(missing_ok=True)
-    except Exception:
-        pass
+    for file_path in file_paths:
+        if not file_path:
+            continue
+        try:
+            Path(file_path).unlink(missing_ok=True)
+        except Exception:
+            pass
 
 
 @router.post("") #if a POST request is sent to /api/collections, this function is called.
@@ -75,7 +143,7 @@ async def create_collection_endpoint(request: dict):
 
 @router.patch("/{collection_id}")
 async def update_collection_endpoint(
-    collection_id: int,
+    collection_id: PathId,
     request: dict
 ):
     """
@@ -109,15 +177,17 @@ async def get_all_collections_endpoint():
     
     Returns a list of all collections in the system.
     """
-    async with get_db() as db:
+    async with get_db(readonly=True) as db:
         # Fetch all collections from database (ordered by created_at DESC)
         collections = await get_all_collections(db)
         
-        return [dict(collection) for collection in collections]
+        # Rows hold only SQLite scalars, so render them with orjson directly
+        # and skip FastAPI's jsonable_encoder walk over every row.
+        return ORJSONResponse([dict(collection) for collection in collections])
 
 
 @router.delete("/{collection_id}")
-async def delete_collection_endpoint(collection_id: int):
+async def delete_collection_endpoint(collection_id: PathId):
     """
     Delete a collection and its associated runs/results.
 
@@ -211,17 +281,66 @@ async def delete_collection_endpoint(collection_id: int):
         )
 
         await db.commit()
+        _collection_exists_cache.pop(collection_id, None)
+
+    # Unlink files once the writer is released
+    await asyncio.to_thread(
+        _delete_files_if_exist, [row["stored_path"] for row in orphan_rows]
+    )
 
-        for row in orphan_rows:
-            _delete_file_if_exists(row["stored_path"])
+    return {"status": "deleted", "collection_id": collection_id}
 
-        return {"status": "deleted", "collection_id": collection_id}
+
+async def _build_collection_payload(db, collection_id: int, model_id: Optional[int]) -> dict:
+    """
+    Run the collection detail queries and return the response payload.
+
+    Raises HTTPException 404 if the collection does not exist.
+    """
+    # The queries below only depend on collection_id / the latest run, so
+    # issue them together: aiosqlite queues them on its worker thread and
+    # runs them back-to-back instead of waiting on the event loop between each.
+    collection, latest_run = await asyncio.gather(
+        get_collection(db, collection_id),
+        get_latest_run(db, collection_id, model_id),
+    )
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    collection_dict = dict(collection)
+    image_count = int(collection_dict.get("image_count") or 0)
+    latest_run_dict = dict(latest_run) if latest_run else None
+    
+    if latest_run_dict:
+        # If there's a latest run, get images with their results from that run
+        images_query = get_collection_images_with_results(
+            db,
+            collection_id,
+            latest_run_dict['run_id'],
+        )
+        processed_count = int(latest_run_dict.get("processed_count") or 0)
+        can_start_run = processed_count != image_count
+    else:
+        # No runs yet, just get images without results
+        images_query = get_collection_images(db, collection_id)
+        can_start_run = image_count > 0
+    
+    # Images plus all runs for this collection (for showing run history)
+    images, all_runs = await asyncio.gather(images_query, get_all_runs(db, collection_id))
+    
+    # Image helpers already return plain dicts, so only Rows need converting.
+    return {
+        "collection": collection_dict,
+        "images": images,
+        "latest_run": latest_run_dict,
+        "all_runs": [dict(run) for run in all_runs],
+        "can_start_run": can_start_run,
+    }
 
 
 @router.get("/{collection_id}")
 async def get_collection_endpoint(
-    collection_id: int,
-    model_id: Optional[int] = None
+    collection_id: PathId,
+    model_id: OptionalQueryId = None
 ):
     """
     Get detailed information about a specific collection.
@@ -241,49 +360,33 @@ async def get_collection_endpoint(
     If a latest run exists, images include their inference results from that run.
     Otherwise, images are returned without results.
     """
-    async with get_db() as db:
-        collection = await get_collection(db, collection_id)
-        if not collection:
-            raise HTTPException(status_code=404, detail="Collection not found")
-        collection_dict = dict(collection)
-        image_count = int(collection_dict.get("image_count") or 0)
-        
-        # Get latest run - either for specific model or overall latest.
-        latest_run = await get_latest_run(db, collection_id, model_id)
-        latest_run_dict = dict(latest_run) if latest_run else None
-        
-        if latest_run_dict:
-            # If there's a latest run, get images with their results from that run
-            images = await get_collection_images_with_results(
-                db,
-                collection_id,
-                latest_run_dict['run_id'],
-            )
-            processed_count = int(latest_run_dict.get("processed_count") or 0)
-            can_start_run = processed_count != image_count
+    async with get_db(readonly=True) as db:
+        # Reuse the payload built on this reader unless any commit landed since
+        data_version = await get_data_version(db)
+        cache = _collection_payload_cache.setdefault(db, {})
+        key = (collection_id, model_id)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == data_version:
+            payload = cached[1]
         else:
-            # No runs yet, just get images without results
-            images = await get_collection_images(db, collection_id)
-            can_start_run = image_count > 0
-        
-        # Get all runs for this collection (for showing run history)
-        all_runs = await get_all_runs(db, collection_id)
-        
-        return {
-            "collection": collection_dict,
-            "images": [dict(img) for img in images],
-            "latest_run": latest_run_dict,
-            "all_runs": [dict(run) for run in all_runs],
-            "can_start_run": can_start_run,
+            payload = await _build_collection_payload(db, collection_id, model_id)
+            if len(cache) >= _COLLECTION_PAYLOAD_MAX_ENTRIES:
+                cache.clear()
+            cache[key] = (data_version, payload)
+
+        # Payload values are plain dicts/lists/scalars; rendering with orjson
+        # directly skips FastAPI's jsonable_encoder walk.
+        return ORJSONResponse({
+            **payload,
             "server_time": datetime.now(timezone.utc).isoformat(),
-        }
+        })
 
 
 @router.get("/{collection_id}/recalculate")
 async def recalculate_threshold_endpoint(
-    collection_id: int,
+    collection_id: PathId,
     threshold: float,
-    model_id: int
+    model_id: QueryId
 ):
     """
     Recalculate mussel counts for a new threshold without re-running the model.
@@ -310,18 +413,15 @@ async def recalculate_threshold_endpoint(
         raise HTTPException(status_code=400, detail="Threshold must be between 0 and 1")
 
     async with get_db() as db:
+        # Take the write lock up front so all count updates land atomically
+        await db.execute("BEGIN IMMEDIATE")
+
         # Verify collection exists
-        collection = await get_collection(db, collection_id)
-        if not collection:
+        if not await _collection_exists(db, collection_id):
             raise HTTPException(status_code=404, detail="Collection not found")
 
         # Find the latest run for this collection with the specified model
-        cursor = await db.execute(
-            """SELECT run_id FROM run
-               WHERE collection_id = ? AND model_id = ?
-               ORDER BY run_id DESC LIMIT 1""",
-            (collection_id, model_id)
-        )
+        cursor = await db.execute(_SQL_RECALC_LATEST_RUN, (collection_id, model_id))
         run_row = await cursor.fetchone()
 
         if not run_row:
@@ -334,16 +434,22 @@ async def recalculate_threshold_endpoint(
 
         run_id = run_row[0]
 
-        rows = await get_counts_by_image_for_run(db, run_id, threshold)
+        now = datetime.now(timezone.utc).isoformat()
+
+        # Recalculate and store every image_result count inside SQLite
+        await update_counts_for_run(db, run_id, threshold, now)
+
+        # Read back the stored counts to build the response
+        cursor = await db.execute(_SQL_RECALC_SELECT_COUNTS, (run_id,))
+        rows = await cursor.fetchall()
 
-        # Build response and update database
         images_dict = {}
         live_total = 0
         dead_total = 0
-        now = datetime.now(timezone.utc).isoformat()
 
-        # Update each image_result with new counts
         for image_id, live_count, dead_count in rows:
+            live_count = live_count or 0
+            dead_count = dead_count or 0
 
             images_dict[image_id] = {
                 "live_count": live_count,
@@ -353,24 +459,8 @@ async def recalculate_threshold_endpoint(
             live_total += live_count
             dead_total += dead_count
 
-            # Update image_result table with new counts
-            await db.execute(
-                """UPDATE image_result
-                   SET live_mussel_count = ?,
-                       dead_mussel_count = ?,
-                       processed_at = ?
-                   WHERE image_id = ? AND run_id = ?""",
-                (live_count, dead_count, now, image_id, run_id)
-            )
-
         # Update run threshold and totals
-        await db.execute(
-            """UPDATE run
-               SET threshold = ?,
-                   live_mussel_count = ?
-               WHERE run_id = ?""",
-            (threshold, live_total, run_id)
-        )
+        await db.execute(_SQL_RECALC_UPDATE_RUN, (threshold, live_total, run_id))
 
         await db.commit()
 
@@ -386,16 +476,19 @@ async def recalculate_threshold_endpoint(
 
 @router.post("/{collection_id}/upload-images")
 async def upload_images_endpoint(
-    collection_id: int,
+    collection_id: PathId,
     files: List[UploadFile] = File(...)
 ):
     """
     Upload multiple images to a collection.
     
     Process:
-    1. Processes files (invalid files are skipped)
-    2. Processes each file in parallel (validates, hashes, saves to disk)
-    3. Adds images to collection using optimized bulk insert
+    1. Streams each file to disk in parallel (validates, hashes, sniffs);
+       no database connection is held while request bodies arrive
+    2. Looks up existing copies by hash on a read connection and gives each
+       file its final name
+    3. Adds images to collection using optimized bulk insert, the only step
+       that takes the shared writer
     4. Handles duplicates (same image already in collection)
     
     Returns:
@@ -404,45 +497,71 @@ async def upload_images_endpoint(
     - duplicate_count: Number of images already in collection
     - duplicate_image_ids: List of duplicate image IDs
     
-    Images are deduplicated by MD5 hash, so uploading the same file twice
+    Images are deduplicated by SHA-256 hash, so uploading the same file twice
     only stores one copy but links it to the collection.
     """
     try:
-        async with get_db() as db:
-            # Process all files in parallel for better performance
-            # return_exceptions=True allows us to handle individual file errors gracefully
-            results = await asyncio.gather(
-                *(process_single_file(file, db) for file in files),
-                return_exceptions=True,
-            )
-            
-            # Collect successfully processed files
-            # Each result is (file_path, filename, file_hash) or None/Exception if invalid
-            image_data = []
-            for file, result in zip(files, results):
-                if isinstance(result, Exception):
+        # 404 before reading any request bodies
+        async with get_db(readonly=True) as db:
+            if not await _collection_exists(db, collection_id):
+                raise HTTPException(status_code=404, detail="Collection not found")
+
+        # Stream files in parallel, bounded so huge batches don't hold
+        # thousands of open temp files at once
+        semaphore = asyncio.Semaphore(_UPLOAD_CONCURRENCY)
+
+        async def stream_bounded(file: UploadFile):
+            async with semaphore:
+                return await stream_upload(file)
+
+        # return_exceptions=True allows us to handle individual file errors gracefully
+        staged = await asyncio.gather(
+            *(stream_bounded(file) for file in files),
+            return_exceptions=True,
+        )
+
+        # Collect successfully processed files
+        # Each result is (file_path, filename, file_hash) or None if storing failed
+        image_data = []
+        first_path_by_hash = {}
+        redundant_paths = []
+        async with get_db(readonly=True) as db:
+            for item in staged:
+                if not item or isinstance(item, Exception):
                     # Skip files that failed validation
                     continue
+                result = await store_upload(db, item)
                 if result:
+                    file_path, filename, file_hash = result
+                    # Same content selected twice in one batch: keep the first
+                    # stored copy and drop the extra file written for the repeat
+                    kept_path = first_path_by_hash.setdefault(file_hash, file_path)
+                    if kept_path != file_path:
+                        redundant_paths.append(file_path)
+                        result = (kept_path, filename, file_hash)
                     image_data.append(result)
-            
-            if not image_data:
-                raise HTTPException(status_code=400, detail="No valid image files uploaded")
-            
+        if redundant_paths:
+            await asyncio.to_thread(_delete_files_if_exist, redundant_paths)
+
+        if not image_data:
+            raise HTTPException(status_code=400, detail="No valid image files uploaded")
+
+        async with get_db() as db:
             # Bulk add images to collection (handles deduplication and linking)
             # This is optimized to minimize database queries
             image_ids, added_count, duplicate_count, duplicate_image_ids = await add_multiple_images_optimized(
                 db, collection_id, image_data
             )
-            
-            return {
-                "collection_id": collection_id,
-                "image_ids": image_ids,
-                "count": len(image_ids),
-                "added_count": added_count,
-                "duplicate_count": duplicate_count,
-                "duplicate_image_ids": duplicate_image_ids,
-            }
+
+        # Server-built ints and lists only: render directly, no encoder pass
+        return ORJSONResponse({
+            "collection_id": collection_id,
+            "image_ids": image_ids,
+            "count": len(image_ids),
+            "added_count": added_count,
+            "duplicate_count": duplicate_count,
+            "duplicate_image_ids": duplicate_image_ids,
+        })
     except HTTPException:
         raise
     except Exception as exc:
@@ -451,8 +570,8 @@ async def upload_images_endpoint(
 
 @router.delete("/{collection_id}/images/{image_id}")
 async def delete_image_from_collection_endpoint(
-    collection_id: int,
-    image_id: int
+    collection_id: PathId,
+    image_id: PathId
 ):
     """
     Remove an image from a collection.
@@ -464,7 +583,10 @@ async def delete_image_from_collection_endpoint(
     and updates the collection's total count.
     """
     async with get_db() as db:
-        if not await get_collection(db, collection_id):
+        # Unlink, cleanup and run recalculation commit together as one transaction
+        await db.execute("BEGIN IMMEDIATE")
+
+        if not await _collection_exists(db, collection_id):
             raise HTTPException(status_code=404, detail="Collection not found")
 
         image_cursor = await db.execute(
@@ -501,28 +623,18 @@ async def delete_image_from_collection_endpoint(
                    WHERE image_id = ? AND run_id IN ({placeholders})""",
                 (image_id, *run_ids)
             )
-        
-        # Recalculate counts for each affected run
-        for run_row in affected_runs:
-            run_id = run_row[0]
-            
-            # Recalculate totals from remaining image results in this run
-            totals_cursor = await db.execute(
-                """SELECT 
-                       SUM(live_mussel_count) as total_live
-                   FROM image_result
-                   WHERE run_id = ?""",
-                (run_id,)
-            )
-            totals = await totals_cursor.fetchone()
-            total_live = totals['total_live'] or 0
-            
-            # Update run totals (run table only has live_mussel_count)
+
+            # Recalculate totals for every affected run from its remaining image results
+            # (run table only has live_mussel_count)
             await db.execute(
-                """UPDATE run
-                   SET live_mussel_count = ?
-                   WHERE run_id = ?""",
-                (total_live, run_id)
+                f"""UPDATE run
+                   SET live_mussel_count = (
+                       SELECT COALESCE(SUM(ir.live_mussel_count), 0)
+                       FROM image_result ir
+                       WHERE ir.run_id = run.run_id
+                   )
+                   WHERE run_id IN ({placeholders})""",
+                run_ids
             )
 
         orphan_file_path = None
@@ -541,6 +653,7 @@ async def delete_image_from_collection_endpoint(
         
         await db.commit()
 
-        _delete_file_if_exists(orphan_file_path)
+    # Unlink the file once the writer is released
+    await asyncio.to_thread(_delete_files_if_exist, [orphan_file_path])
 
-        return {"collection_id": collection_id, "image_id": image_id, "status": "removed"}
+    return {"collection_id": collection_id, "image_id": image_id, "status": "removed"}
@@ -5,13 +5,15 @@ This router handles retrieving detailed information about individual images,
 including inference results, polygon data, and metadata.
 """
 
-import json
+import asyncio
+import orjson
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel
 from db import get_db
 from datetime import datetime, timezone
-from utils.detection_counts import get_counts_for_image
+from utils.detection_counts import update_counts_for_image
+from api.params import PathId, QueryId
 
 router = APIRouter(prefix="/api/images", tags=["images"])
 
@@ -47,9 +49,123 @@ class ImageDetailResponse(BaseModel):
     collection_id: int
 
 
+# Image detail query: the latest result row for image/model/collection, with that
+# run's detections folded in as a JSON array.
+_SQL_IMAGE_DETAIL = """
+    WITH latest AS (
+        SELECT 
+            i.image_id,
+            i.filename,
+            i.stored_path,
+            COALESCE(ir.live_mussel_count, 0) AS live_mussel_count,
+            COALESCE(ir.dead_mussel_count, 0) AS dead_mussel_count,
+            COALESCE(ir.live_mussel_count, 0) + COALESCE(ir.dead_mussel_count, 0) AS total_mussel_count,
+            ir.processed_at,
+            ir.error_msg,
+            r.run_id,
+            r.collection_id,
+            r.threshold,
+            r.model_id,
+            m.name as model_name,
+            m.type as model_type
+        FROM image i
+        JOIN image_result ir ON i.image_id = ir.image_id
+        JOIN run r ON ir.run_id = r.run_id
+        JOIN model m ON r.model_id = m.model_id
+        WHERE i.image_id = ? AND r.model_id = ?
+          AND r.collection_id = ?
+        ORDER BY r.run_id DESC
+        LIMIT 1
+    )
+    SELECT
+        latest.*,
+        (
+            SELECT json_group_array(json_object(
+                'detection_id', d.detection_id,
+                'bbox', COALESCE(
+                            CASE WHEN json_valid(d.bbox)
+                                 THEN CASE WHEN json_type(d.bbox) = 'array' AND json_array_length(d.bbox) = 4
+                                           THEN json(d.bbox) END
+                            END,
+                            json_array()
+                        ),
+                'class', replace(d.class, 'edit_', ''),
+                'confidence', d.confidence,
+                'manually_edited', CASE WHEN substr(d.class, 1, 5) = 'edit_'
+                                        THEN json('true') ELSE json('false') END
+            ))
+            FROM (
+                SELECT detection_id, confidence, class, bbox
+                FROM detection
+                WHERE run_id = latest.run_id AND image_id = latest.image_id
+                ORDER BY detection_id ASC
+            ) AS d
+        ) AS polygons
+    FROM latest
+"""
+
+# Placeholder lookups for an image that has no results for the model yet
+_SQL_IMAGE_IN_COLLECTION = """
+    SELECT i.image_id, i.filename, i.stored_path, ci.collection_id
+    FROM image i
+    JOIN collection_image ci ON ci.image_id = i.image_id
+    WHERE i.image_id = ? AND ci.collection_id = ?
+    LIMIT 1
+"""
+
+_SQL_MODEL_NAME_TYPE = "SELECT name, type FROM model WHERE model_id = ?"
+
+# Detection on the latest run for this image/model within the collection
+_SQL_EDITABLE_DETECTION = """
+    SELECT d.detection_id, d.class, d.run_id, r.threshold
+    FROM detection d
+    JOIN run r ON d.run_id = r.run_id
+    WHERE d.detection_id = ?
+      AND d.image_id = ?
+      AND r.model_id = ?
+      AND r.collection_id = ?
+      AND d.run_id = (
+          SELECT r2.run_id
+          FROM run r2
+          JOIN detection d2 ON d2.run_id = r2.run_id
+          WHERE d2.image_id = ? AND r2.model_id = ?
+            AND r2.collection_id = ?
+          ORDER BY r2.run_id DESC
+          LIMIT 1
+      )
+    LIMIT 1
+"""
+
+_SQL_SET_DETECTION_CLASS = "UPDATE detection SET class = ? WHERE detection_id = ?"
+
+# Re-sum the run totals from all image results in the run
+_SQL_RESUM_RUN_TOTALS = """
+    UPDATE run
+    SET live_mussel_count = (
+        SELECT COALESCE(SUM(live_mussel_count), 0)
+        FROM image_result
+        WHERE run_id = ?
+    )
+    WHERE run_id = ?
+    RETURNING
+        live_mussel_count AS total_live,
+        (
+            SELECT COALESCE(SUM(dead_mussel_count), 0)
+            FROM image_result
+            WHERE run_id = ?
+        ) AS total_dead
+"""
+
+
+async def _fetch_one(db, sql: str, params):
+    """Run a query and return its first row (or None)."""
+    rows = await db.execute_fetchall(sql, params)
+    return rows[0] if rows else None
+
+
 #When you open an image in the /results page this is called
 @router.get("/{image_id}/results", response_model=ImageDetailResponse)
-async def get_image_results_endpoint(image_id: int, model_id: int, collection_id: int) -> ImageDetailResponse:
+async def get_image_results_endpoint(image_id: PathId, model_id: QueryId, collection_id: QueryId) -> ImageDetailResponse:
     """
     Get detailed results for a specific image from a specific run.
     
@@ -72,48 +188,21 @@ async def get_image_results_endpoint(image_id: int, model_id: int, collection_id
         HTTPException 404: If image result not found
         HTTPException 400: If invalid IDs provided
     """
-    async with get_db() as db:
-        # Get main image and result data
+    async with get_db(readonly=True) as db:
+        # Get main image and result data, with the run's detections folded in
+        # as a JSON array so the whole page loads in one round-trip.
         params = [image_id, model_id, collection_id]
-        cursor = await db.execute("""
-            SELECT 
-                i.image_id,
-                i.filename,
-                i.stored_path,
-                ir.live_mussel_count,
-                ir.dead_mussel_count,
-                ir.processed_at,
-                ir.error_msg,
-                r.run_id,
-                r.collection_id,
-                r.threshold,
-                r.model_id,
-                m.name as model_name,
-                m.type as model_type
-            FROM image i
-            JOIN image_result ir ON i.image_id = ir.image_id
-            JOIN run r ON ir.run_id = r.run_id
-            JOIN model m ON r.model_id = m.model_id
-            WHERE i.image_id = ? AND r.model_id = ?
-              AND r.collection_id = ?
-            ORDER BY r.run_id DESC
-            LIMIT 1
-        """, params)
-        
-        result = await cursor.fetchone()
+        result = await _fetch_one(db, _SQL_IMAGE_DETAIL, params)
         
         if not result:
             # No run results found for this image/model/collection.
             # Return a placeholder response with zero counts so the image page can still render.
-            # Get basic image metadata scoped to the collection
-            image_cursor = await db.execute("""
-                SELECT i.image_id, i.filename, i.stored_path, ci.collection_id
-                FROM image i
-                JOIN collection_image ci ON ci.image_id = i.image_id
-                WHERE i.image_id = ? AND ci.collection_id = ?
-                LIMIT 1
-            """, (image_id, collection_id))
-            image_row = await image_cursor.fetchone()
+            # Image metadata (scoped to the collection) and model metadata are
+            # independent, so issue both lookups together
+            image_row, model_row = await asyncio.gather(
+                _fetch_one(db, _SQL_IMAGE_IN_COLLECTION, (image_id, collection_id)),
+                _fetch_one(db, _SQL_MODEL_NAME_TYPE, (model_id,)),
+            )
 
             if not image_row:
                 raise HTTPException(
@@ -121,16 +210,10 @@ async def get_image_results_endpoint(image_id: int, model_id: int, collection_id
                     detail=f"No image {image_id} found in collection {collection_id}"
                 )
 
-            # Get model metadata
-            model_cursor = await db.execute(
-                "SELECT name, type FROM model WHERE model_id = ?",
-                (model_id,)
-            )
-            model_row = await model_cursor.fetchone()
             if not model_row:
                 raise HTTPException(status_code=404, detail=f"Model {model_id} not found")
 
-            return ImageDetailResponse(
+            return ImageDetailResponse.model_construct(
                 image_id=image_row['image_id'],
                 filename=image_row['filename'],
                 stored_path=image_row['stored_path'],
@@ -151,44 +234,15 @@ async def get_image_results_endpoint(image_id: int, model_id: int, collection_id
                 collection_id=image_row['collection_id'],
             )
         
-        # Build polygon payload from detection rows in the database.
-        polygons = []
-        detections_cursor = await db.execute(
-            """
-            SELECT detection_id, confidence, class, bbox
-            FROM detection
-            WHERE run_id = ? AND image_id = ?
-            ORDER BY detection_id ASC
-            """,
-            (result["run_id"], image_id),
-        )
-        detection_rows = await detections_cursor.fetchall()
-        for row in detection_rows:
-            bbox = []
-            if row["bbox"]:
-                try:
-                    parsed = json.loads(row["bbox"])
-                    if isinstance(parsed, list) and len(parsed) == 4:
-                        bbox = parsed
-                except Exception:
-                    bbox = []
-
-            stored_class = row["class"]
-            manually_edited = stored_class.startswith("edit_")
-            polygon = {
-                "detection_id": row["detection_id"],
-                "bbox": bbox,
-                "class": stored_class.replace("edit_", ""),
-                "confidence": row["confidence"],
-                "manually_edited": manually_edited,
-            }
-            polygons.append(polygon)
+        # Polygon payload built by SQLite (a malformed bbox comes back as [])
+        polygons = orjson.loads(result["polygons"])
         detection_count = len(polygons)
         
-        # Calculate percentages
-        live_count = result['live_mussel_count'] or 0
-        dead_count = result['dead_mussel_count'] or 0
-        total_count = live_count + dead_count
+        # Counts and total come from SQL; rounding stays in Python because
+        # SQLite's ROUND() rounds ties away from zero (6.25 -> 6.3, not 6.2)
+        live_count = result['live_mussel_count']
+        dead_count = result['dead_mussel_count']
+        total_count = result['total_mussel_count']
         
         live_percentage = None
         dead_percentage = None
@@ -196,7 +250,9 @@ async def get_image_results_endpoint(image_id: int, model_id: int, collection_id
             live_percentage = round((live_count / total_count) * 100, 1)
             dead_percentage = round((dead_count / total_count) * 100, 1)
         
-        return ImageDetailResponse(
+        # Every field comes from typed DB columns or is computed above, so
+        # build the model without re-validating it field by field
+        return ImageDetailResponse.model_construct(
             # Image metadata
             image_id=result['image_id'],
             filename=result['filename'],
@@ -230,10 +286,10 @@ async def get_image_results_endpoint(image_id: int, model_id: int, collection_id
 #edit endpoint
 @router.patch("/{image_id}/results/{model_id}/detections/{detection_id}", response_model=Dict)
 async def update_polygon_classification(
-    image_id: int,
-    model_id: int,
-    detection_id: int,
-    collection_id: int,
+    image_id: PathId,
+    model_id: PathId,
+    detection_id: PathId,
+    collection_id: QueryId,
     new_class: str = Body(..., embed=True),
 ) -> Dict:
     """
@@ -256,29 +312,16 @@ async def update_polygon_classification(
         raise HTTPException(status_code=400, detail="Classification must be 'live' or 'dead'")
 
     async with get_db() as db:
+        # Take the write lock up front so the class change and both count
+        # updates land in one transaction (get_db rolls back on any exit
+        # that doesn't commit)
+        await db.execute("BEGIN IMMEDIATE")
+
         # Resolve detection on the latest run for this image/model within this collection.
         params = [detection_id, image_id, model_id, collection_id]
         subquery_params = [image_id, model_id, collection_id]
 
-        cursor = await db.execute("""
-            SELECT d.detection_id, d.class, d.run_id
-            FROM detection d
-            JOIN run r ON d.run_id = r.run_id
-            WHERE d.detection_id = ?
-              AND d.image_id = ?
-              AND r.model_id = ?
-              AND r.collection_id = ?
-              AND d.run_id = (
-                  SELECT r2.run_id
-                  FROM run r2
-                  JOIN detection d2 ON d2.run_id = r2.run_id
-                  WHERE d2.image_id = ? AND r2.model_id = ?
-                    AND r2.collection_id = ?
-                  ORDER BY r2.run_id DESC
-                  LIMIT 1
-              )
-            LIMIT 1
-        """, params + subquery_params)
+        cursor = await db.execute(_SQL_EDITABLE_DETECTION, params + subquery_params)
 
         detection = await cursor.fetchone()
         if not detection:
@@ -292,52 +335,21 @@ async def update_polygon_classification(
         if old_class == new_class:
             return {"message": "Classification unchanged", "detection_id": detection_id}
 
-        await db.execute(
-            """
-            UPDATE detection
-            SET class = ?
-            WHERE detection_id = ?
-            """,
-            (f"edit_{new_class}", detection_id),
-        )
-
-        # Recalculate counts from detection table
-        # This uses the same logic as the recalculation endpoint
-        run_cursor = await db.execute("""
-            SELECT run_id, threshold FROM run WHERE run_id = ?
-        """, (run_id,))
-        run_info = await run_cursor.fetchone()
-        threshold = run_info['threshold'] if run_info else 0.5
+        await db.execute(_SQL_SET_DETECTION_CLASS, (f"edit_{new_class}", detection_id))
 
-        live_count, dead_count = await get_counts_for_image(db, run_id, image_id, threshold)
-
-        # Update image_result
+        # Recalculate this image's counts from the detection table and store
+        # them (same logic as the recalculation endpoint)
         now = datetime.now(timezone.utc).isoformat()
-        await db.execute("""
-            UPDATE image_result
-            SET live_mussel_count = ?,
-                dead_mussel_count = ?,
-                processed_at = ?
-            WHERE image_id = ? AND run_id = ?
-        """, (live_count, dead_count, now, image_id, run_id))
-
-        # Update run totals (recalculate from all image results in this run)
-        run_cursor = await db.execute("""
-            SELECT SUM(live_mussel_count) as total_live,
-                   SUM(dead_mussel_count) as total_dead
-            FROM image_result
-            WHERE run_id = ?
-        """, (run_id,))
+        live_count, dead_count = await update_counts_for_image(
+            db, run_id, image_id, detection['threshold'], now
+        )
 
-        totals = await run_cursor.fetchone()
-        total_live = totals['total_live'] or 0
-        total_dead = totals['total_dead'] or 0
+        # Re-sum the run totals from all image results in this run
+        run_cursor = await db.execute(_SQL_RESUM_RUN_TOTALS, (run_id, run_id, run_id))
 
-        await db.execute("""
-            UPDATE run
-            SET live_mussel_count = ?
-            WHERE run_id = ?
-        """, (total_live, run_id))
+        totals = await run_cursor.fetchone()
+        total_live = totals['total_live']
+        total_dead = totals['total_dead']
 
         await db.commit()
 
@@ -5,38 +5,113 @@ This router handles retrieving information about available ML models.
 Models can be R-CNN or YOLO architectures, each with their own weights file.
 """
 
-from typing import List, Optional
+import asyncio
+import hashlib
+import os
+import time
+from typing import BinaryIO, Dict, List, Optional, Tuple
 from pathlib import Path
-import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from db import get_db
-from utils.model_utils import get_all_models, get_model
+import orjson
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Response
+from db import get_db, ensure_models_registered
+from utils.model_utils import get_all_models, get_model, get_model_by_hash, upsert_model
 from utils.security import sanitize_filename
 from api.schemas import ModelResponse
-from config import MODELS_DIR
+from api.params import PathId
+from config import MODELS_DIR, MAX_MODEL_SIZE
 
 router = APIRouter(prefix="/api/models", tags=["models"])
 
 # Model file extensions
 MODEL_EXTENSIONS = ['.pt', '.pth', '.ckpt']
 
+# Read/write granularity for streamed model uploads
+_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+# Serialized GET responses, keyed by "all" or the model_id. The model table
+# only changes when a model is uploaded (which clears this), so the TTL is
+# just a backstop against edits made outside the API.
+_MODELS_CACHE_TTL = 30.0
+_models_cache: Dict[object, Tuple[float, bytes]] = {}
+_models_cache_lock = asyncio.Lock()
+
+
+def _cached_models_json(key: object) -> Optional[bytes]:
+    """Return the cached JSON body for key if it hasn't expired."""
+    entry = _models_cache.get(key)
+    if entry and time.monotonic() - entry[0] < _MODELS_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def _save_model_file(src: BinaryIO, dest: Path) -> Tuple[int, str]:
+    """
+    Stream an uploaded model into a new file at dest.
+
+    Runs in a worker thread. The bytes are copied in fixed chunks and hashed
+    on the same pass, so the weights are read once and memory stays O(chunk)
+    however large they are. Raises FileExistsError if dest exists and
+    ValueError past MAX_MODEL_SIZE; the partial file is removed on any failure.
+
+    Returns (size_in_bytes, hex_digest).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(dest, "xb") as f:  # 'x' = fail if exists (TOCTOU-safe)
+        try:
+            while chunk := src.read(_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_MODEL_SIZE:
+                    raise ValueError(f"Model file exceeds {MAX_MODEL_SIZE} bytes")
+                digest.update(chunk)
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            os.unlink(dest)
+            raise
+    return size, digest.hexdigest()
+
 
 @router.get("", response_model=List[ModelResponse])
-async def get_all_models_endpoint() -> List[ModelResponse]:
+async def get_all_models_endpoint() -> Response:
     """Get all available models"""
-    async with get_db() as db:
-        models = await get_all_models(db)
-        return [ModelResponse.model_validate(dict(model)) for model in models]
+    body = _cached_models_json("all")
+    if body is None:
+        async with _models_cache_lock:
+            body = _cached_models_json("all")
+            if body is None:
+                await ensure_models_registered()
+                async with get_db(readonly=True) as db:
+                    models = await get_all_models(db)
+                # Dump through ModelResponse so only its fields are exposed
+                body = orjson.dumps([
+                    ModelResponse(**model).model_dump()
+                    for model in models
+                ])
+                _models_cache["all"] = (time.monotonic(), body)
+    return _json_response(body)
 
 
 @router.get("/{model_id}", response_model=ModelResponse)
-async def get_model_endpoint(model_id: int) -> ModelResponse:
+async def get_model_endpoint(model_id: PathId) -> Response:
     """Get model information"""
-    async with get_db() as db:
-        model = await get_model(db, model_id)
-        if not model:
-            raise HTTPException(status_code=404, detail="Model not found")
-        return ModelResponse.model_validate(dict(model))
+    body = _cached_models_json(model_id)
+    if body is None:
+        async with _models_cache_lock:
+            body = _cached_models_json(model_id)
+            if body is None:
+                await ensure_models_registered()
+                async with get_db(readonly=True) as db:
+                    model = await get_model(db, model_id)
+                if not model:
+                    raise HTTPException(status_code=404, detail="Model not found")
+                body = orjson.dumps(ModelResponse(**model).model_dump())
+                _models_cache[model_id] = (time.monotonic(), body)
+    return _json_response(body)
 
 
 @router.post("", response_model=ModelResponse)
@@ -61,20 +136,22 @@ async def create_model_endpoint(
             detail=f"Invalid file type. Supported: {', '.join(MODEL_EXTENSIONS)}"
         )
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="File is empty")
-
     if model_type not in {"YOLO", "FASTRCNN"}:
         raise HTTPException(status_code=400, detail="model_type must be YOLO or FASTRCNN")
 
+    # Weights already in MODELS_DIR must be registered (and hashed) before
+    # the duplicate check, and before this upload lands in the directory
+    # (the scan would otherwise register the new file as a seeded model)
+    await ensure_models_registered()
+
     model_name = name or Path(sanitized_filename).stem
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     file_path = MODELS_DIR / sanitized_filename
 
     try:
-        async with aiofiles.open(file_path, "xb") as f:
-            await f.write(content)
+        size, file_hash = await asyncio.to_thread(_save_model_file, file.file, file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except FileExistsError:
         raise HTTPException(
             status_code=400,
@@ -85,31 +162,36 @@ async def create_model_endpoint(
             status_code=500,
             detail=f"Failed to save model file: {str(e)}"
         )
+    if not size:
+        file_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail="File is empty")
 
     async with get_db() as db:
-        cursor = await db.execute(
-            "SELECT model_id, name FROM model WHERE weights_path = ?",
-            (str(file_path),)
-        )
-        existing = await cursor.fetchone()
+        # Same weights uploaded before: keep the existing model, drop the copy
+        # and say so (the submitted name and type are not applied)
+        duplicate = await get_model_by_hash(db, file_hash)
+        if duplicate:
+            await asyncio.to_thread(file_path.unlink, missing_ok=True)
+            raise HTTPException(
+                status_code=409,
+                detail=f"These weights are already registered as model '{duplicate['name']}' (id {duplicate['model_id']})."
+            )
+
+        model_id = await upsert_model(db, model_name, model_type, str(file_path), file_hash)
 
-        if existing:
+        if model_id is None:
+            cursor = await db.execute(
+                "SELECT name FROM model WHERE weights_path = ?",
+                (str(file_path),)
+            )
+            existing = await cursor.fetchone()
             raise HTTPException(
                 status_code=400,
-                detail=f"Model '{existing[1]}' already exists. Please upload a different model file or use a different filename."
+                detail=f"Model '{existing[0]}' already exists. Please upload a different model file or use a different filename."
             )
 
-        cursor = await db.execute(
-            """INSERT INTO model (name, type, weights_path)
-               VALUES (?, ?, ?)""",
-            (
-                model_name,
-                model_type,
-                str(file_path)
-            )
-        )
-        model_id = cursor.lastrowid
         await db.commit()
+        _models_cache.clear()
 
         model = await get_model(db, model_id)
-        return ModelResponse.model_validate(dict(model))
+        return ModelResponse(**model)
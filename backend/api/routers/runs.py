@@ -11,19 +11,39 @@ threshold, producing mussel counts and polygon annotations for each image.
 Runs execute asynchronously in the background so the API can return immediately.
 """
 
-from fastapi import APIRouter, BackgroundTasks, HTTPException
-from db import get_db
+import asyncio
+from typing import AsyncIterator, Mapping
+
+import orjson
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from db import get_db, ensure_models_registered
 from utils.collection_utils import get_collection
 from utils.model_utils import get_model
-from utils.run_utils import get_or_create_run, process_collection_run, get_run, update_run_status
+from utils.run_utils import (
+    get_or_create_run, get_run, try_cancel_run, enqueue_run,
+    get_run_snapshot, drop_run_snapshot, subscribe_run, unsubscribe_run,
+)
 from api.schemas import StartRunRequest, RunResponse
+from api.params import PathId
 from config import DEFAULT_THRESHOLD
 
 router = APIRouter(prefix="/api", tags=["runs"])
 
+# Statuses a run can still move on from
+_ACTIVE_STATUSES = ('pending', 'running')
+
+# Comment line sent on an idle event stream so proxies keep it open
+_SSE_KEEPALIVE_SECONDS = 15.0
+
+
+def _sse_event(run: Mapping) -> bytes:
+    """Encode a run row/snapshot as one Server-Sent Events message."""
+    return b"data: " + orjson.dumps(RunResponse(**run).model_dump()) + b"\n\n"
+
 
 @router.get("/runs/{run_id}", response_model=RunResponse)
-async def get_run_endpoint(run_id: int) -> RunResponse:
+async def get_run_endpoint(run_id: PathId) -> RunResponse:
     """
     Get run information including status, progress, and results.
 
@@ -33,16 +53,76 @@ async def get_run_endpoint(run_id: int) -> RunResponse:
     - Results (live_mussel_count, dead_mussel_count)
     - Timestamps (started_at, finished_at)
     """
-    async with get_db() as db:
+    # Polled while a run is in progress: the run worker keeps an in-memory
+    # copy of the run it is processing, so those polls skip the database
+    snapshot = get_run_snapshot(run_id)
+    if snapshot is not None:
+        return RunResponse(**snapshot)
+
+    # Otherwise a reader sees the run processor's commits without queueing
+    # behind the shared writer
+    async with get_db(readonly=True) as db:
         run = await get_run(db, run_id)
         if not run:
             raise HTTPException(status_code=404, detail="Run not found")
-        return RunResponse.model_validate(dict(run))
+        return RunResponse(**run)
+
+
+@router.get("/runs/{run_id}/events")
+async def run_events_endpoint(run_id: PathId) -> StreamingResponse:
+    """
+    Stream a run's progress as Server-Sent Events.
+
+    Sends the current run first, then a new message each time the run worker
+    records progress, and closes after the run reaches a final status. Each
+    message's data is the same JSON as GET /api/runs/{run_id}, so clients can
+    react to progress without polling.
+    """
+    # Subscribe before reading the current state so no update falls between
+    queue = subscribe_run(run_id)
+    try:
+        run = get_run_snapshot(run_id)
+        if run is None:
+            async with get_db(readonly=True) as db:
+                run = await get_run(db, run_id)
+            if not run:
+                raise HTTPException(status_code=404, detail="Run not found")
+    except BaseException:
+        unsubscribe_run(run_id, queue)
+        raise
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            yield _sse_event(run)
+            status = run['status']
+            while status in _ACTIVE_STATUSES:
+                try:
+                    update = await asyncio.wait_for(queue.get(), _SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if update is None:
+                    # Snapshot dropped: the run finished or was stopped, so
+                    # its final state is in the database
+                    async with get_db(readonly=True) as db:
+                        update = await get_run(db, run_id)
+                    if not update:
+                        return
+                yield _sse_event(update)
+                status = update['status']
+        finally:
+            unsubscribe_run(run_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/collections/{collection_id}/run", response_model=RunResponse)
 async def start_run_endpoint(
-    collection_id: int, run_request: StartRunRequest, background_tasks: BackgroundTasks
+    collection_id: PathId, run_request: StartRunRequest
 ) -> RunResponse:
     """
     Start an inference run on a collection.
@@ -51,13 +131,16 @@ async def start_run_endpoint(
     1. Validates collection and model exist
     2. Validates threshold value
     3. Creates a run record in the database
-    4. Starts background processing (returns immediately, doesn't wait for completion)
+    4. Queues the run for background processing (returns immediately, doesn't wait for completion)
 
     The actual inference processing happens asynchronously in the background.
     The frontend can poll the run status to see progress and results as they come in.
 
     Returns the run ID and initial status ("pending") immediately.
     """
+    # The model may be a weights file that hasn't been registered yet
+    await ensure_models_registered()
+
     async with get_db() as db:
         # Verify collection exists
         collection = await get_collection(db, collection_id)
@@ -72,33 +155,24 @@ async def start_run_endpoint(
         # Request model already validates range; just apply default if explicitly null.
         threshold = run_request.threshold if run_request.threshold is not None else DEFAULT_THRESHOLD
 
-        # Get or create run record in database (reuses run if same collection+model+threshold)
-        run_id, _ = await get_or_create_run(db, collection_id, run_request.model_id, threshold)
-
-        # Fetch the run record to get all fields for the response
-        run_record = await get_run(db, run_id)
+        # Get or create run record in database (reuses run if same collection+model+threshold).
+        # The full row comes back with it, so no second lookup is needed.
+        run_record, _ = await get_or_create_run(db, collection_id, run_request.model_id, threshold)
         if not run_record:
             raise HTTPException(status_code=500, detail="Failed to create run")
+        run_id = run_record['run_id']
 
-        # Start background task to process the run
-        # This runs asynchronously so the API can return immediately
-        # The task will load the model, process all images, and update results incrementally
-        async def run_inference_task():
-            # Create new database connection for background task
-            # (each async task needs its own connection)
-            async with get_db() as db_task:
-                await process_collection_run(db_task, run_id)
-
-        # Add task to FastAPI's background task queue
-        # FastAPI will execute this after sending the response
-        background_tasks.add_task(run_inference_task)
+        # Hand the run to the run worker, which loads the model, processes all
+        # images and updates results incrementally. A run that is already
+        # queued or in progress is not scheduled a second time.
+        enqueue_run(run_id)
 
         # Return the run response with all fields from database
-        return RunResponse.model_validate(dict(run_record))
+        return RunResponse(**run_record)
 
 
 @router.post("/runs/{run_id}/stop", response_model=RunResponse)
-async def stop_run_endpoint(run_id: int) -> RunResponse:
+async def stop_run_endpoint(run_id: PathId) -> RunResponse:
     """
     Stop/cancel a running inference run.
     
@@ -111,24 +185,20 @@ async def stop_run_endpoint(run_id: int) -> RunResponse:
     Returns the updated run information with status 'cancelled'.
     """
     async with get_db() as db:
-        # Get the run to check its current status
-        run = await get_run(db, run_id)
-        if not run:
-            raise HTTPException(status_code=404, detail="Run not found")
-        
-        # Check if the run can be stopped
-        if run['status'] not in ('pending', 'running'):
-            raise HTTPException(
-                status_code=400,
-                detail=f"Cannot stop run with status '{run['status']}'. Only pending or running runs can be stopped."
-            )
+        # Cancel only if still pending/running, getting the updated row back
+        updated_run = await try_cancel_run(db, run_id, 'Run cancelled by user')
+        if updated_run:
+            drop_run_snapshot(run_id)
+            return RunResponse(**updated_run)
         
-        # Update the run status to 'cancelled'
-        await update_run_status(db, run_id, 'cancelled', 'Run cancelled by user')
-        
-        # Fetch updated run record
-        updated_run = await get_run(db, run_id)
-        if not updated_run:
-            raise HTTPException(status_code=500, detail="Failed to update run")
+        # Nothing was updated: tell a missing run apart from a finished one
+        rows = await db.execute_fetchall(
+            "SELECT status FROM run WHERE run_id = ?", (run_id,)
+        )
+        if not rows:
+            raise HTTPException(status_code=404, detail="Run not found")
         
-        return RunResponse.model_validate(dict(updated_run))
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot stop run with status '{rows[0]['status']}'. Only pending or running runs can be stopped."
+        )
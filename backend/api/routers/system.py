@@ -6,13 +6,20 @@ They're typically used by the frontend to:
 - Check if backend is running
 - Detect database resets (to refresh cached data)
 """
+import time
 from fastapi import APIRouter
 from db import get_db, get_db_version
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 router = APIRouter(tags=["system"])
 # Note: System endpoints are excluded from rate limiting in main.py
 
+# The db version only changes when init_db() runs, which happens at process
+# startup before this cache can be filled, so a short TTL is enough to keep
+# the frontend's polling from hitting the database on every call.
+_DB_VERSION_TTL = 5.0
+_db_version_cache: Optional[Tuple[Optional[str], float]] = None
+
 
 @router.get("/")
 def root() -> Dict[str, str]:
@@ -33,7 +40,13 @@ async def get_db_version_endpoint() -> Dict[str, str | None]:
     to detect when the database has been reset (timestamp changes), which
     means all data has been cleared and cached data should be refreshed.
     """
-    async with get_db() as db:
+    global _db_version_cache
+    now = time.monotonic()
+    if _db_version_cache and now - _db_version_cache[1] < _DB_VERSION_TTL:
+        return {"db_version": _db_version_cache[0]}
+
+    async with get_db(readonly=True) as db:
         version = await get_db_version(db)
-        return {"db_version": version}
+    _db_version_cache = (version, now)
+    return {"db_version": version}
 
@@ -4,6 +4,8 @@ Pydantic models for request/response validation
 from pydantic import BaseModel, Field, ConfigDict
 from typing import Optional, List
 
+from api.params import SQLITE_MAX_INTEGER
+
 
 # ===== Request Models =====
 
@@ -19,7 +21,7 @@ class UpdateCollectionRequest(BaseModel):
 
 class StartRunRequest(BaseModel):
     """Request model for starting a run"""
-    model_id: int = Field(..., description="ID of the model to use")
+    model_id: int = Field(..., ge=1, le=SQLITE_MAX_INTEGER, description="ID of the model to use")
     threshold: Optional[float] = Field(
         default=0.5,
         ge=0.0,
@@ -10,37 +10,49 @@ from pathlib import Path
 
 # Base data directory (writable). Defaults to local ./data but can be overridden (e.g., Electron userData)
 DATA_DIR = Path(os.getenv("BACKEND_DATA_DIR", "data"))
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 # File upload settings
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", DATA_DIR / "uploads"))  # Directory where uploaded images are stored
+MAX_IMAGE_SIZE = int(os.getenv("MAX_IMAGE_SIZE", str(50 * 1024 * 1024)))  # Largest accepted image upload (bytes)
 
 # Model settings
 _DEFAULT_MODELS_DIR = DATA_DIR / "models"
 MODELS_DIR = Path(os.getenv("MODELS_DIR", str(_DEFAULT_MODELS_DIR)))
+MAX_MODEL_SIZE = int(os.getenv("MAX_MODEL_SIZE", str(1024 * 1024 * 1024)))  # Largest accepted model upload (bytes)
 
 # Database settings
 DB_PATH = os.getenv("DB_PATH", str(DATA_DIR / "mussel_counter.db"))  # SQLite database file path
 SCHEMA_PATH = Path(__file__).parent / "schema.sql"  # Path to SQL schema file
 RESET_DB_ON_STARTUP = os.getenv("RESET_DB_ON_STARTUP", "false").lower() in {"1", "true", "yes"}
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))  # Read-only connections kept open for GET endpoints
 
 # CORS (Cross-Origin Resource Sharing) settings
 # For a solo app we default to allowing any origin. To restrict, set FRONTEND_URL.
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 if FRONTEND_URL:
-    CORS_ORIGINS = [
-        FRONTEND_URL,
-        FRONTEND_URL.replace("localhost", "127.0.0.1") if "localhost" in FRONTEND_URL else None,
-    ]
-    CORS_ORIGINS = [origin for origin in CORS_ORIGINS if origin]
+    CORS_ORIGINS = (FRONTEND_URL,)
+    if "localhost" in FRONTEND_URL:
+        CORS_ORIGINS += (FRONTEND_URL.replace("localhost", "127.0.0.1"),)
 else:
-    CORS_ORIGINS = ["*"]
+    CORS_ORIGINS = ("*",)
 
 # Model inference settings
 DEFAULT_THRESHOLD = 0.5  # Default confidence threshold for mussel detection (0.0 to 1.0)
+INFERENCE_THREAD_NICE = int(os.getenv("INFERENCE_THREAD_NICE", "5"))  # Nice increment for the inference thread (Linux); 0 disables
 
-# Ensure upload directory exists on startup
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+_dirs_ready = False
 
-# Ensure model directory exists so startup detection doesn't fail
-MODELS_DIR.mkdir(parents=True, exist_ok=True)
+
+def ensure_dirs() -> None:
+    """
+    Create the data, upload and model directories (once per process).
+
+    Called from init_db() at startup rather than at import, so importing
+    config (reload workers, scripts, tooling) doesn't touch the filesystem.
+    """
+    global _dirs_ready
+    if _dirs_ready:
+        return
+    for directory in (DATA_DIR, UPLOAD_DIR, MODELS_DIR, Path(DB_PATH).parent):
+        directory.mkdir(parents=True, exist_ok=True)
+    _dirs_ready = True
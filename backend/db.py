@@ -3,29 +3,244 @@ Database connection and initialization utilities.
 
 This module provides:
 - Database connection management (context manager for automatic cleanup)
+- A connection pool: one shared writer plus read-only reader connections
 - Database initialization (creates tables from schema.sql)
 - Database version tracking (to detect schema changes)
 """
 
+import asyncio
+import time
+import zlib
 import aiosqlite
 from contextlib import asynccontextmanager
-from config import DB_PATH, SCHEMA_PATH, RESET_DB_ON_STARTUP, MODELS_DIR
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from config import DB_PATH, SCHEMA_PATH, RESET_DB_ON_STARTUP, MODELS_DIR, DB_READ_POOL_SIZE, ensure_dirs
 from datetime import datetime, timezone
+from utils.model_utils.db import register_models, set_model_hashes
+from utils.file_processing import hash_file
+from utils.image_utils import upgrade_legacy_hashes
 
+# Per-connection tuning applied whenever a connection is opened.
+# WAL lets readers keep going while a run writes results, synchronous=NORMAL
+# drops the fsync on every commit (still durable at checkpoints in WAL mode),
+# and the cache/mmap/temp settings keep hot pages in memory.
+# wal_autocheckpoint/journal_size_limit bound how far the WAL grows during
+# upload and recalculate bursts before it is checkpointed and truncated.
+# busy_timeout makes a connection wait up to 5 s for a competing writer (e.g.
+# a run's private connection) instead of failing with SQLITE_BUSY; sqlite3's
+# default connect timeout happens to match, but this doesn't rely on it.
+# On SQLite builds from the wal2 branch, journal_mode=wal2 is a drop-in
+# replacement here (checkpoints no longer stall concurrent readers).
+_JOURNAL_PRAGMA = "PRAGMA journal_mode=WAL;"
+_CONNECTION_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA busy_timeout=5000;
+    PRAGMA wal_autocheckpoint=1000;
+    PRAGMA journal_size_limit=67108864;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    PRAGMA mmap_size=268435456;
+"""
+
+# Parsed statements kept per connection (sqlite3 defaults to 128). The app
+# reuses a fixed set of SQL strings, so a larger cache means no re-parsing.
+_STATEMENT_CACHE_SIZE = 512
+
+# Connection pool, opened by open_pool() during app startup.
+# SQLite allows a single writer, so writes share one connection behind a lock,
+# while reads check out one of several read-only connections (WAL lets them
+# run alongside the writer).
+_writer: aiosqlite.Connection | None = None
+_writer_last_used = 0.0
+_writer_lock = asyncio.Lock()
+_reader_pool: asyncio.Queue | None = None  # (connection, last_used) pairs
+
+# A pooled connection idle for longer than this is pinged on checkout and
+# replaced if it no longer answers (pool_pre_ping, checked lazily).
+_PRE_PING_AFTER = 60.0
 
-async def _initialize_models(db: aiosqlite.Connection):
+# Weights files in MODELS_DIR are registered on first use rather than during
+# init_db(), keeping the directory scan off the startup path
+_models_registered = False
+_models_registered_lock = asyncio.Lock()
+
+
+async def _connect(readonly: bool = False) -> aiosqlite.Connection:
     """
-    Initialize database with default models from models/ directory.
+    Open a new connection with the PRAGMA tuning and dict-like rows applied.
+    """
+    if readonly:
+        db = await aiosqlite.connect(
+            f"{Path(DB_PATH).resolve().as_uri()}?mode=ro",
+            uri=True,
+            cached_statements=_STATEMENT_CACHE_SIZE,
+        )
+        # Belt and braces on top of mode=ro: reject writes at the statement level
+        await db.execute("PRAGMA query_only=1")
+    else:
+        db = await aiosqlite.connect(DB_PATH, cached_statements=_STATEMENT_CACHE_SIZE)
+        await db.executescript(_JOURNAL_PRAGMA)
+    await db.executescript(_CONNECTION_PRAGMAS)
+    # Enable row factory to return dict-like rows (access by column name)
+    # Without this, rows would be tuples accessed by index
+    db.row_factory = aiosqlite.Row
+    return db
+
+
+async def open_pool() -> None:
+    """
+    Open the shared writer connection and the read-only reader pool.
+    """
+    global _writer, _writer_last_used, _reader_pool
+    if _writer is not None:
+        return
+
+    # Open the writer first so the database is in WAL mode before readers attach
+    _writer = await _connect()
+    _writer_last_used = time.monotonic()
+    _reader_pool = asyncio.Queue()
+    for _ in range(DB_READ_POOL_SIZE):
+        _reader_pool.put_nowait((await _connect(readonly=True), time.monotonic()))
+
+
+async def close_pool() -> None:
+    """
+    Close every pooled connection.
+    """
+    global _writer, _reader_pool
+    if _reader_pool is not None:
+        while not _reader_pool.empty():
+            db, _ = _reader_pool.get_nowait()
+            await db.close()
+        _reader_pool = None
+    if _writer is not None:
+        await _writer.close()
+        _writer = None
+
+
+async def _checkout(db: aiosqlite.Connection, last_used: float, readonly: bool) -> aiosqlite.Connection:
+    """
+    Return db, or a fresh replacement if it sat idle and no longer responds.
+    """
+    if time.monotonic() - last_used < _PRE_PING_AFTER:
+        return db
+    try:
+        await db.execute("SELECT 1")
+        return db
+    except Exception:
+        try:
+            await db.close()
+        except Exception:
+            pass
+        return await _connect(readonly=readonly)
+
+
+@asynccontextmanager
+async def connect_db():
+    """
+    Context manager for a private connection outside the pool.
+
+    Use this for long-lived work (e.g. background inference runs) that must not
+    hold the shared writer for its whole duration.
+    """
+    db = await _connect()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def _scan_models_dir() -> Optional[Tuple[str, List[Path]]]:
+    """
+    List the weights files in MODELS_DIR along with the directory's mtime.
+
+    Blocking filesystem calls only, so it is run in a worker thread.
     """
     models_dir = MODELS_DIR
     if not models_dir.exists():
-        return
-    
-    model_files = list(models_dir.glob("*.pt")) + list(models_dir.glob("*.pth"))
-    if not model_files:
-        return
-    
+        return None
+    scan_mtime = str(models_dir.stat().st_mtime_ns)
+    return scan_mtime, list(models_dir.glob("*.pt")) + list(models_dir.glob("*.pth"))
+
+
+def _hash_model_files(model_files: List[Path]) -> Dict[str, str]:
+    """
+    SHA-256 of each weights file, keyed by path; unreadable files are left out.
+
+    Blocking file reads only, so it is run in a worker thread.
+    """
+    hashes = {}
+    for model_file in model_files:
+        try:
+            hashes[str(model_file)] = hash_file(model_file)
+        except OSError:
+            pass
+    return hashes
+
+
+async def _pending_model_files(
+    db: aiosqlite.Connection, scan: Tuple[str, List[Path]]
+) -> Optional[Tuple[List[Path], Set[str]]]:
+    """
+    Work out which files from a _scan_models_dir() result need a registration pass.
+
+    The directory's mtime (which changes whenever a file is added, removed or
+    renamed in it) is stored in db_metadata after each pass, so an unchanged
+    directory is skipped (returns None) unless some model still has no hash.
+    Otherwise returns (files_to_hash, registered_paths): new files plus
+    registered ones missing their hash, and which of them are already rows.
+    Reads only, so a reader connection will do.
+    """
+    scan_mtime, model_files = scan
+    rows = await db.execute_fetchall(
+        "SELECT value FROM db_metadata WHERE key = ?", ("models_scan_mtime",)
+    )
+    if rows and rows[0][0] == scan_mtime:
+        unhashed = await db.execute_fetchall(
+            "SELECT 1 FROM model WHERE file_hash IS NULL LIMIT 1"
+        )
+        if not unhashed:
+            return None
+
+    # One lookup for every already-registered file instead of one per file
+    registered: Dict[str, Optional[str]] = {}
+    if model_files:
+        paths = [str(model_file) for model_file in model_files]
+        rows = await db.execute_fetchall(
+            f"SELECT weights_path, file_hash FROM model WHERE weights_path IN ({','.join('?' * len(paths))})",
+            paths,
+        )
+        registered = {row[0]: row[1] for row in rows}
+
+    to_hash = [f for f in model_files if registered.get(str(f)) is None]
+    return to_hash, set(registered)
+
+
+async def _initialize_models(
+    db: aiosqlite.Connection,
+    scan_mtime: str,
+    model_files: List[Path],
+    registered: Set[str],
+    hashes: Dict[str, str],
+):
+    """
+    Initialize database with default models from models/ directory.
+
+    Takes the result of _pending_model_files() and the files' hashes.
+    Seeded files are hashed like uploaded ones, so uploading the same weights
+    again is recognised as a duplicate; files registered before hashes were
+    recorded get theirs filled in.
+    """
+    new_models = []
+    backfill = []
     for model_file in model_files:
+        path = str(model_file)
+        if path in registered:
+            if path in hashes:
+                backfill.append((hashes[path], path))
+            continue
+
         # Infer model type from filename
         filename_lower = model_file.name.lower()
         if "yolo" in filename_lower:
@@ -35,48 +250,88 @@ async def _initialize_models(db: aiosqlite.Connection):
         else:
             model_type = "YOLO"  # Default to YOLO
         
-        # Check if model already exists
-        cursor = await db.execute(
-            "SELECT model_id FROM model WHERE weights_path = ?",
-            (str(model_file),)
-        )
-        existing = await cursor.fetchone()
-        
-        if not existing:
-            # Add model to database.
-            await db.execute(
-                """INSERT INTO model (name, type, weights_path)
-                   VALUES (?, ?, ?)""",
-                (
-                    model_file.stem,
-                    model_type,
-                    str(model_file)
-                )
-            )
-    
+        new_models.append((model_file.stem, model_type, path, hashes.get(path)))
+
+    # Add all new models in one batch (already-registered paths are skipped)
+    if new_models:
+        await register_models(db, new_models)
+    if backfill:
+        await set_model_hashes(db, backfill)
+
+    await db.execute(
+        "INSERT OR REPLACE INTO db_metadata (key, value) VALUES (?, ?)",
+        ("models_scan_mtime", scan_mtime),
+    )
+    await db.commit()
+
+
+async def _ensure_model_hash_column(db: aiosqlite.Connection) -> None:
+    """
+    Add model.file_hash (and its index) to databases created before it existed.
+
+    CREATE TABLE IF NOT EXISTS leaves existing tables untouched, so the new
+    column has to be added here. The index is created here too, since it
+    can only be built once the column is present.
+    """
+    cursor = await db.execute("PRAGMA table_info(model)")
+    columns = {row[1] for row in await cursor.fetchall()}
+    if "file_hash" not in columns:
+        await db.execute("ALTER TABLE model ADD COLUMN file_hash TEXT")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS ix_model_file_hash ON model(file_hash)"
+    )
     await db.commit()
 
 
 @asynccontextmanager
-async def get_db():
+async def get_db(readonly: bool = False):
     """
     Context manager for database connections.
     
-    Provides a database connection that automatically:
-    - Opens connection when entering context
-    - Sets row factory to return dict-like rows (access columns by name)
-    - Closes connection when exiting context
+    Provides a pooled database connection that:
+    - Comes from a read-only reader pool when readonly=True (pure GET handlers)
+    - Otherwise is the shared writer, held exclusively until the context exits
+    - Has the SQLite PRAGMA tuning applied (WAL, synchronous=NORMAL, caches)
+    - Returns dict-like rows (access columns by name)
+    - Rolls back any uncommitted writes when the context exits
+    - Is pinged first if it sat idle for a while, and reopened if it is dead
+    
+    Falls back to a fresh connection when the pool has not been opened
+    (e.g. scripts running outside the FastAPI app).
     
     Usage:
-        async with get_db() as db:
-            cursor = await db.execute("SELECT * FROM batch")
+        async with get_db(readonly=True) as db:
+            cursor = await db.execute("SELECT * FROM collection")
             rows = await cursor.fetchall()
     """
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Enable row factory to return dict-like rows (access by column name)
-        # Without this, rows would be tuples accessed by index
-        db.row_factory = aiosqlite.Row
-        yield db
+    global _writer, _writer_last_used
+    if _writer is None:
+        async with connect_db() as db:
+            yield db
+        return
+
+    if readonly:
+        db, last_used = await _reader_pool.get()
+        try:
+            db = await _checkout(db, last_used, readonly=True)
+        except BaseException:
+            _reader_pool.put_nowait((db, last_used))
+            raise
+        try:
+            yield db
+        finally:
+            _reader_pool.put_nowait((db, time.monotonic()))
+        return
+
+    async with _writer_lock:
+        _writer = await _checkout(_writer, _writer_last_used, readonly=False)
+        try:
+            yield _writer
+        finally:
+            # Don't leak a half-finished transaction to the next request
+            if _writer.in_transaction:
+                await _writer.rollback()
+            _writer_last_used = time.monotonic()
 
 
 async def init_db() -> None:
@@ -84,66 +339,155 @@ async def init_db() -> None:
     Initialize the database by creating all tables from schema.sql.
     
     This function:
-    1. Deletes existing database if found (development mode - in production use migrations)
-    2. Reads schema.sql and executes it to create all tables
+    0. Creates the data, upload and model directories if missing
+    1. Deletes existing database if the reset flag is set (development mode)
+    2. Reads schema.sql and executes it to create all tables and indexes
     3. Creates db_metadata table for tracking database version
     4. Stores initialization timestamp in metadata
+    5. Re-hashes images stored with legacy MD5 hashes as SHA-256
+    6. Adds the model.file_hash column to databases created before it existed
     
-    Note: In production, you'd want proper database migrations instead of
-    deleting and recreating the database.
+    schema.sql only uses CREATE ... IF NOT EXISTS, so it can be applied to an
+    existing database as a lightweight migration step: tables or indexes added
+    to the schema later get created in place. Once steps 2-4 and 6 succeed, the
+    database's PRAGMA user_version is set to a checksum of schema.sql, and
+    later startups with the same schema skip steps 2-4 and 6. Editing
+    schema.sql changes the checksum, so the schema is applied again.
     """
     import os
 
-    # Skip re-initialization if database already exists and reset flag is not set
-    if os.path.exists(DB_PATH) and not RESET_DB_ON_STARTUP:
-        return
+    ensure_dirs()
 
     # Delete existing database when reset flag is enabled
     if os.path.exists(DB_PATH) and RESET_DB_ON_STARTUP:
         os.remove(DB_PATH)
 
     # Read the schema file containing CREATE TABLE statements
-    with open(SCHEMA_PATH, "r") as f:
-        schema = f.read()
+    schema = await asyncio.to_thread(SCHEMA_PATH.read_text)
+    # user_version is a signed 32-bit integer; 0 means "never initialized"
+    schema_version = (zlib.crc32(schema.encode()) & 0x7FFFFFFF) or 1
 
-    # Execute the schema to create all tables
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.executescript(schema)  # Execute all SQL statements in schema file
-
-        # Create metadata table to store database version/reset timestamp
-        # This allows the frontend to detect when database was reset and refresh data
-        # IF NOT EXISTS prevents error if table already exists
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS db_metadata (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-        """)
-
-        # Check if metadata already exists (for existing databases that weren't reset)
-        cursor = await db.execute(
-            "SELECT value FROM db_metadata WHERE key = ?", ("db_init_timestamp",)
-        )
-        existing_metadata = await cursor.fetchone()
-
-        if not existing_metadata:
-            # Store database initialization timestamp (new database or existing without metadata)
-            # Frontend can check this to detect database resets
-            init_timestamp = datetime.now(timezone.utc).isoformat()
-            await db.execute(
-                "INSERT OR REPLACE INTO db_metadata (key, value) VALUES (?, ?)",
-                ("db_init_timestamp", init_timestamp),
-            )
+        # journal_mode=WAL is persistent, so new databases start out in WAL mode
+        await db.executescript(_JOURNAL_PRAGMA)
+        await db.executescript(_CONNECTION_PRAGMAS)
+
+        rows = await db.execute_fetchall("PRAGMA user_version")
+        if rows[0][0] != schema_version:
+            await _apply_schema(db, schema)
+            await db.execute(f"PRAGMA user_version = {schema_version}")
             await db.commit()
-        
-        # Seed model rows for any weights already present in MODELS_DIR.
-        await _initialize_models(db)
+
+        # Bring images hashed before the switch to SHA-256 in line with new
+        # uploads (kept outside the version check: rows whose file was
+        # missing are retried on the next startup)
+        await upgrade_legacy_hashes(db)
+
+
+async def _collapse_duplicate_model_paths(db: aiosqlite.Connection) -> None:
+    """
+    Merge model rows that share a weights_path, so ux_model_weights_path can be built.
+
+    Databases from before that index could hold several rows for one file
+    (e.g. a weights file removed from disk and uploaded again under the same
+    name). The newest row is kept and runs of the older ones are moved to it.
+    """
+    cursor = await db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'model'"
+    )
+    if not await cursor.fetchone():
+        return  # new database: nothing to merge
+
+    older = """SELECT model_id FROM model AS m
+               WHERE EXISTS (SELECT 1 FROM model AS n
+                             WHERE n.weights_path = m.weights_path
+                               AND n.model_id > m.model_id)"""
+    await db.execute(
+        f"""UPDATE run
+            SET model_id = (SELECT MAX(n.model_id) FROM model AS m
+                            JOIN model AS n ON n.weights_path = m.weights_path
+                            WHERE m.model_id = run.model_id)
+            WHERE model_id IN ({older})"""
+    )
+    await db.execute(f"DELETE FROM model WHERE model_id IN ({older})")
+    await db.commit()
+
+
+async def _apply_schema(db: aiosqlite.Connection, schema: str) -> None:
+    """Create or migrate tables, indexes and metadata (init_db steps 2-4 and 6)."""
+    await _collapse_duplicate_model_paths(db)
+    await db.executescript(schema)  # Execute all SQL statements in schema file (idempotent)
+
+    # Create metadata table to store database version/reset timestamp
+    # This allows the frontend to detect when database was reset and refresh data
+    # IF NOT EXISTS prevents error if table already exists
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS db_metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    """)
+
+    # Check if metadata already exists (for existing databases that weren't reset)
+    cursor = await db.execute(
+        "SELECT value FROM db_metadata WHERE key = ?", ("db_init_timestamp",)
+    )
+    existing_metadata = await cursor.fetchone()
+
+    if not existing_metadata:
+        # Store database initialization timestamp (new database or existing without metadata)
+        # Frontend can check this to detect database resets
+        init_timestamp = datetime.now(timezone.utc).isoformat()
+        await db.execute(
+            "INSERT OR REPLACE INTO db_metadata (key, value) VALUES (?, ?)",
+            ("db_init_timestamp", init_timestamp),
+        )
+        await db.commit()
+
+    await _ensure_model_hash_column(db)
+
+
+async def ensure_models_registered() -> None:
+    """
+    Seed model rows for weights already present in MODELS_DIR, once per process.
+
+    Called by the model endpoints before they read the model table, so the
+    scan happens on the first request that needs it instead of at startup.
+    """
+    global _models_registered
+    if _models_registered:
+        return
+    async with _models_registered_lock:
+        if _models_registered:
+            return
+        scan = await asyncio.to_thread(_scan_models_dir)
+        if scan is not None:
+            async with get_db(readonly=True) as db:
+                pending = await _pending_model_files(db, scan)
+            if pending is not None:
+                model_files, registered = pending
+                # Weights can be hundreds of MB: hash them without holding
+                # a connection, then take the writer only for the inserts
+                hashes = await asyncio.to_thread(_hash_model_files, model_files) if model_files else {}
+                async with get_db() as db:
+                    await _initialize_models(db, scan[0], model_files, registered, hashes)
+        _models_registered = True
 
 
 async def get_db_version(db: aiosqlite.Connection) -> str | None:
     """Get the database version/timestamp"""
-    cursor = await db.execute(
+    rows = await db.execute_fetchall(
         "SELECT value FROM db_metadata WHERE key = ?", ("db_init_timestamp",)
     )
-    row = await cursor.fetchone()
-    return row["value"] if row else None
+    return rows[0]["value"] if rows else None
+
+
+async def get_data_version(db: aiosqlite.Connection) -> int:
+    """
+    Get this connection's PRAGMA data_version.
+
+    The value changes whenever another connection commits to the database,
+    so it can be used to tell whether cached query results are still current.
+    """
+    rows = await db.execute_fetchall("PRAGMA data_version")
+    return rows[0][0]
@@ -14,9 +14,11 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
-from db import init_db
+from db import init_db, open_pool, close_pool
+from utils.run_utils import start_run_worker, stop_run_worker
 from config import CORS_ORIGINS, UPLOAD_DIR
 from api.routers import collections, models, runs, system, images
+from api.responses import ORJSONResponse
 from api.error_handlers import (
     validation_exception_handler,
     general_exception_handler
@@ -31,15 +33,22 @@ async def lifespan(app: FastAPI):
     
     On startup:
     - Initializes the SQLite database and creates all tables from schema.sql
+    - Opens the database connection pool (shared writer + read-only readers)
+    - Starts the run worker and re-queues runs interrupted by the last shutdown
     - Optimizes CPU threading for PyTorch operations
     
     On shutdown:
-    - Currently no cleanup needed (SQLite handles connection closing automatically)
+    - Stops the run worker (unfinished runs resume on next startup)
+    - Closes the pooled database connections
     """
     # Startup: Initialize database schema and tables
     await init_db()
+    await open_pool()
+    await start_run_worker()
     yield
-    # Shutdown: (nothing needed for now - SQLite connections close automatically)
+    # Shutdown: stop the run worker, then close pooled connections
+    await stop_run_worker()
+    await close_pool()
 
 
 # Create FastAPI app instance
@@ -48,15 +57,16 @@ app = FastAPI(
     title="Mussel Counter API",
     description="Backend API for mussel counting application",
     version="1.0.0",
-    lifespan=lifespan  # Register lifespan manager for startup/shutdown
+    lifespan=lifespan,  # Register lifespan manager for startup/shutdown
+    default_response_class=ORJSONResponse,  # Encode endpoint return values with orjson
 )
 
 # Add CORS middleware to allow frontend (running on different port) to make requests
 # Without this, browser would block cross-origin requests
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=CORS_ORIGINS,  # List of allowed frontend URLs (["*"] allowed for solo app)
-    allow_credentials=False if CORS_ORIGINS == ["*"] else True,  # "*" requires credentials=False
+    allow_origins=CORS_ORIGINS,  # Allowed frontend URLs (("*",) allowed for solo app)
+    allow_credentials=False if CORS_ORIGINS == ("*",) else True,  # "*" requires credentials=False
     allow_methods=["*"],  # Allow all HTTP methods (GET, POST, etc.)
     allow_headers=["*"],  # Allow all request headers
 )
@@ -76,4 +86,5 @@ app.include_router(images.router)  # Image detail and results
 
 # Mount static files to serve uploaded images
 # This allows frontend to access images via /uploads/{filename}
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# (check_dir=False: the directory is created by init_db() at startup)
+app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR), check_dir=False), name="uploads")
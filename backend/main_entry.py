@@ -15,7 +15,11 @@ def main():
     # Import the FastAPI app
     from main import app
 
-    # Run uvicorn
+    # Run uvicorn in a single process. The run queue, the in-memory run
+    # snapshots/progress streams and the response caches live in this
+    # process, so extra workers (WEB_CONCURRENCY) would each resume the same
+    # pending runs and miss each other's progress. Request concurrency comes
+    # from the event loop and the database reader pool instead.
     uvicorn.run(
         app,
         host=host,
@@ -22,7 +22,7 @@ hiddenimports = [
     'starlette',
     'pydantic',
     'aiosqlite',
-    'aiofiles',
+    'orjson',
     'torch',
     'torchvision',
     'ultralytics',
@@ -51,6 +51,8 @@ hiddenimports += [
     'api.routers.system',
     'api.routers.images',
     'api.error_handlers',
+    'api.responses',
+    'api.params',
     'db',
     'config',
     'utils',
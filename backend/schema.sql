@@ -10,7 +10,7 @@ CREATE TABLE IF NOT EXISTS image (
   image_id    INTEGER PRIMARY KEY AUTOINCREMENT,        
   filename    TEXT NOT NULL,             -- original filename
   stored_path TEXT NOT NULL,             -- where the file is stored
-  file_hash   TEXT UNIQUE                -- MD5 hash for deduplication (UNIQUE ensures no duplicates)
+  file_hash   TEXT UNIQUE                -- SHA-256 hash for deduplication (UNIQUE ensures no duplicates)
 );
 
 -- COLLECTION_IMAGE: junction table linking collections to images (many-to-many)
@@ -28,7 +28,8 @@ CREATE TABLE IF NOT EXISTS model (
   model_id      INTEGER PRIMARY KEY AUTOINCREMENT, 
   name          TEXT NOT NULL,             -- "CNN v2 - 2025-11 blah blah"
   type          TEXT NOT NULL CHECK(type IN ('FASTRCNN', 'YOLO')),  -- canonical model type
-  weights_path  TEXT NOT NULL             -- local path to .pt or .pth file
+  weights_path  TEXT NOT NULL,            -- local path to .pt or .pth file
+  file_hash     TEXT                      -- SHA-256 of the weights (uploaded or found on disk; NULL if unreadable)
 );
 
 -- RUN: each inference run on a collection (can use different models)
@@ -74,3 +75,34 @@ CREATE TABLE IF NOT EXISTS detection (
   FOREIGN KEY (run_id) REFERENCES run(run_id) ON DELETE CASCADE,
   FOREIGN KEY (image_id) REFERENCES image(image_id) ON DELETE CASCADE
 );
+
+-- INDEXES: covering indexes for the hottest lookups
+-- One model row per weights file (lets model registration use ON CONFLICT)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_model_weights_path
+  ON model(weights_path);
+
+-- Threshold recalculation aggregates detections per (run_id, image_id) by class/confidence
+CREATE INDEX IF NOT EXISTS ix_detection_run_image
+  ON detection(run_id, image_id, class, confidence);
+
+-- Thresholded counting range-scans each class by confidence, skipping detections below the threshold
+CREATE INDEX IF NOT EXISTS ix_detection_run_class_conf
+  ON detection(run_id, class, confidence, image_id);
+
+-- Image removal finds the runs that processed an image and re-sums their counts
+CREATE INDEX IF NOT EXISTS ix_image_result_image_run
+  ON image_result(image_id, run_id, live_mussel_count, dead_mussel_count);
+
+-- Latest-run lookups filter runs by collection (and model) and take the highest run_id
+CREATE INDEX IF NOT EXISTS ix_run_collection_model
+  ON run(collection_id, model_id, run_id);
+
+-- One image's detections in a run, already in detection_id order (the rowid is
+-- the implicit last key), for the image detail page and detection edits. Also
+-- serves the ON DELETE CASCADE from image.
+CREATE INDEX IF NOT EXISTS ix_detection_img_run_id
+  ON detection(image_id, run_id);
+
+-- Run totals re-summed from image_result without touching the table rows
+CREATE INDEX IF NOT EXISTS ix_image_result_run
+  ON image_result(run_id, live_mussel_count, dead_mussel_count);
@@ -10,7 +10,7 @@ async def _get_base_collection_images(db: aiosqlite.Connection, collection_id: i
     """
     Fetch base image rows for a collection in newest-added order.
     """
-    cursor = await db.execute(
+    return await db.execute_fetchall(
         """SELECT i.*, ci.added_at
                FROM image i
                JOIN collection_image ci ON i.image_id = ci.image_id
@@ -18,7 +18,6 @@ async def _get_base_collection_images(db: aiosqlite.Connection, collection_id: i
                ORDER BY ci.added_at DESC""",
         (collection_id,),
     )
-    return await cursor.fetchall()
 
 
 async def get_collection(db: aiosqlite.Connection, collection_id: int):
@@ -32,7 +31,7 @@ async def get_collection(db: aiosqlite.Connection, collection_id: int):
     Returns:
         Row with collection data, or None if not found
     """
-    cursor = await db.execute(
+    rows = await db.execute_fetchall(
         """
         SELECT
             c.collection_id,
@@ -56,7 +55,7 @@ async def get_collection(db: aiosqlite.Connection, collection_id: int):
         """,
         (collection_id,),
     )
-    return await cursor.fetchone()
+    return rows[0] if rows else None
 
 
 async def get_all_collections(db: aiosqlite.Connection):
@@ -69,7 +68,7 @@ async def get_all_collections(db: aiosqlite.Connection):
     Returns:
         List of collection rows
     """
-    cursor = await db.execute(
+    return await db.execute_fetchall(
         """
         SELECT
             c.collection_id,
@@ -113,7 +112,6 @@ async def get_all_collections(db: aiosqlite.Connection):
         ORDER BY c.created_at DESC
         """
     )
-    return await cursor.fetchall()
 
 
 async def _attach_processed_models(db: aiosqlite.Connection, rows, collection_id: int):
@@ -132,20 +130,21 @@ async def _attach_processed_models(db: aiosqlite.Connection, rows, collection_id
     """
     if not rows:
         return []
-    image_ids = [row['image_id'] for row in rows]
-    placeholders = ','.join(['?'] * len(image_ids))
-    cursor = await db.execute(
-        f"""SELECT DISTINCT ir.image_id, r.model_id
-               FROM image_result ir
-               JOIN run r ON ir.run_id = r.run_id
-               WHERE r.status IN ('completed', 'completed_with_errors')
-                 AND r.collection_id = ?
-                 AND ir.image_id IN ({placeholders})""",
-        (collection_id, *image_ids)
+    # Scoped by joining collection_image rather than an IN (...) list, so
+    # large collections never hit SQLite's bound-parameter limit.
+    pairs = await db.execute_fetchall(
+        """SELECT DISTINCT ir.image_id, r.model_id
+               FROM run r
+               JOIN image_result ir ON ir.run_id = r.run_id
+               JOIN collection_image ci
+                 ON ci.collection_id = r.collection_id AND ci.image_id = ir.image_id
+               WHERE r.collection_id = ?
+                 AND r.status IN ('completed', 'completed_with_errors')""",
+        (collection_id,)
     )
     model_map = defaultdict(list)
-    for row in await cursor.fetchall():
-        model_map[row['image_id']].append(row['model_id'])
+    for image_id, model_id in pairs:
+        model_map[image_id].append(model_id)
     return [dict(row, processed_model_ids=model_map.get(row['image_id'], [])) for row in rows]
 
 
@@ -172,70 +171,33 @@ async def get_collection_images_with_results(
     """
     Return images in a collection with their inference results.
 
-    Results are scoped strictly to the provided run_id.
+    Results are scoped strictly to the provided run_id. Images without a
+    result for that run get NULL result fields.
     """
-    # 1) Base images in collection.
-    base_images = await _get_base_collection_images(db, collection_id)
-    if not base_images:
-        return []
-
-    image_ids = [row["image_id"] for row in base_images]
-    placeholders = ",".join(["?"] * len(image_ids))
-
-    # Defaults for LEFT JOIN-like behavior.
-    result_by_image = {
-        image_id: {
-            "live_mussel_count": None,
-            "dead_mussel_count": None,
-            "processed_at": None,
-            "error_msg": None,
-            "result_threshold": None,
-        }
-        for image_id in image_ids
-    }
-
-    run_cursor = await db.execute(
-        "SELECT threshold FROM run WHERE run_id = ?",
-        (run_id,),
-    )
-    run_row = await run_cursor.fetchone()
-    run_threshold = run_row["threshold"] if run_row else None
-
-    result_cursor = await db.execute(
-        f"""
-        SELECT image_id, live_mussel_count, dead_mussel_count, processed_at, error_msg
-        FROM image_result
-        WHERE run_id = ? AND image_id IN ({placeholders})
-        """,
-        (run_id, *image_ids),
-    )
-    for row in await result_cursor.fetchall():
-        result_by_image[row["image_id"]] = {
-            "live_mussel_count": row["live_mussel_count"],
-            "dead_mussel_count": row["dead_mussel_count"],
-            "processed_at": row["processed_at"],
-            "error_msg": row["error_msg"],
-            "result_threshold": run_threshold,
-        }
-
-    # 3) Merge base image metadata with result payload.
-    merged_images = []
-    for row in base_images:
-        image_dict = dict(row)
-        image_dict.update(result_by_image[row["image_id"]])
-        merged_images.append(image_dict)
-
-    # Preserve previous ordering semantics:
+    # Base images and their result for this run in one LEFT JOIN, ordered
     # newest add first, then newest processed_at (NULLs treated as very old).
-    merged_images.sort(
-        key=lambda r: (
-            r["added_at"],
-            r["processed_at"] or "1970-01-01T00:00:00Z",
-        ),
-        reverse=True,
+    images = await db.execute_fetchall(
+        """
+        SELECT
+            i.*,
+            ci.added_at,
+            ir.live_mussel_count,
+            ir.dead_mussel_count,
+            ir.processed_at,
+            ir.error_msg,
+            r.threshold AS result_threshold
+        FROM collection_image ci
+        JOIN image i ON i.image_id = ci.image_id
+        LEFT JOIN image_result ir ON ir.image_id = ci.image_id AND ir.run_id = ?
+        LEFT JOIN run r ON r.run_id = ir.run_id
+        WHERE ci.collection_id = ?
+        ORDER BY ci.added_at DESC,
+                 COALESCE(ir.processed_at, '1970-01-01T00:00:00Z') DESC
+        """,
+        (run_id, collection_id),
     )
 
-    return await _attach_processed_models(db, merged_images, collection_id)
+    return await _attach_processed_models(db, images, collection_id)
 
 
 async def remove_image_from_collection(
@@ -246,6 +208,8 @@ async def remove_image_from_collection(
     """
     Remove an image from a collection (does not delete the image itself).
 
+    Does not commit; the caller owns the transaction.
+
     Args:
         db: Database connection
         collection_id: Collection ID
@@ -259,7 +223,6 @@ async def remove_image_from_collection(
         (collection_id, image_id)
     )
 
-    await db.commit()
     return cursor.rowcount > 0
 
 
@@ -272,17 +235,17 @@ async def get_latest_run(
     Get the most recent run for a collection, optionally filtered by model_id.
     """
     if model_id is None:
-        cursor = await db.execute(
+        rows = await db.execute_fetchall(
             "SELECT * FROM run WHERE collection_id = ? ORDER BY run_id DESC LIMIT 1",
             (collection_id,),
         )
-        return await cursor.fetchone()
+        return rows[0] if rows else None
 
-    cursor = await db.execute(
+    rows = await db.execute_fetchall(
         "SELECT * FROM run WHERE collection_id = ? AND model_id = ? ORDER BY run_id DESC LIMIT 1",
         (collection_id, model_id),
     )
-    return await cursor.fetchone()
+    return rows[0] if rows else None
 
 
 async def get_all_runs(db: aiosqlite.Connection, collection_id: int):
@@ -296,8 +259,7 @@ async def get_all_runs(db: aiosqlite.Connection, collection_id: int):
     Returns:
         List of run rows
     """
-    cursor = await db.execute(
+    return await db.execute_fetchall(
         "SELECT * FROM run WHERE collection_id = ? ORDER BY run_id DESC",
         (collection_id,)
     )
-    return await cursor.fetchall()
@@ -36,31 +36,94 @@ async def get_counts_for_image(
     return (row[0] or 0, row[1] or 0)
 
 
-async def get_counts_by_image_for_run(
+async def update_counts_for_image(
     db: aiosqlite.Connection,
     run_id: int,
+    image_id: int,
     threshold: float,
-) -> list[tuple[int, int, int]]:
+    processed_at: str,
+) -> tuple[int, int]:
     """
-    Return per-image counts as (image_id, live_count, dead_count) for a run.
+    Recompute one image_result's counts at a threshold and return (live_count, dead_count).
+
+    Aggregation and write-back happen in a single UPDATE ... FROM ... RETURNING.
+    If the image has no image_result row yet, nothing is written and the
+    counts are computed with get_counts_for_image instead.
     """
     cursor = await db.execute(
-        """SELECT
-               image_id,
-               SUM(CASE
-                   WHEN class = 'edit_live' THEN 1
-                   WHEN class = 'live' AND confidence >= ? THEN 1
-                   ELSE 0
-               END) AS live_count,
-               SUM(CASE
-                   WHEN class = 'edit_dead' THEN 1
-                   WHEN class = 'dead' AND confidence >= ? THEN 1
-                   ELSE 0
-               END) AS dead_count
-           FROM detection
-           WHERE run_id = ?
-           GROUP BY image_id""",
-        (threshold, threshold, run_id),
+        """UPDATE image_result
+           SET live_mussel_count = counts.live_count,
+               dead_mussel_count = counts.dead_count,
+               processed_at = ?
+           FROM (
+               SELECT
+                   COALESCE(SUM(CASE
+                       WHEN class = 'edit_live' THEN 1
+                       WHEN class = 'live' AND confidence >= ? THEN 1
+                       ELSE 0
+                   END), 0) AS live_count,
+                   COALESCE(SUM(CASE
+                       WHEN class = 'edit_dead' THEN 1
+                       WHEN class = 'dead' AND confidence >= ? THEN 1
+                       ELSE 0
+                   END), 0) AS dead_count
+               FROM detection
+               WHERE run_id = ? AND image_id = ?
+           ) AS counts
+           WHERE image_result.run_id = ? AND image_result.image_id = ?
+           RETURNING live_mussel_count, dead_mussel_count""",
+        (processed_at, threshold, threshold, run_id, image_id, run_id, image_id),
+    )
+    row = await cursor.fetchone()
+    if row is None:
+        return await get_counts_for_image(db, run_id, image_id, threshold)
+    return (row[0], row[1])
+
+
+async def update_counts_for_run(
+    db: aiosqlite.Connection,
+    run_id: int,
+    threshold: float,
+    processed_at: str,
+) -> None:
+    """
+    Recompute every image_result count for a run at a threshold in one statement.
+
+    The per-image aggregation and the write-back both happen inside SQLite
+    (no rows travel through Python). Instead of evaluating a CASE for every
+    detection, each branch is a range scan on ix_detection_run_class_conf
+    that only visits qualifying detections (manual edits, or model detections
+    at/above the threshold). Images with nothing qualifying fall back to 0.
+    """
+    await db.execute(
+        """WITH qualifying AS (
+               SELECT image_id, 1 AS is_live FROM detection
+               WHERE run_id = ? AND class = 'live' AND confidence >= ?
+               UNION ALL
+               SELECT image_id, 1 FROM detection
+               WHERE run_id = ? AND class = 'edit_live'
+               UNION ALL
+               SELECT image_id, 0 FROM detection
+               WHERE run_id = ? AND class = 'dead' AND confidence >= ?
+               UNION ALL
+               SELECT image_id, 0 FROM detection
+               WHERE run_id = ? AND class = 'edit_dead'
+           ),
+           counts AS (
+               SELECT image_id,
+                      SUM(is_live) AS live_count,
+                      COUNT(*) - SUM(is_live) AS dead_count
+               FROM qualifying
+               GROUP BY image_id
+           )
+           UPDATE image_result
+           SET live_mussel_count = COALESCE(counts.live_count, 0),
+               dead_mussel_count = COALESCE(counts.dead_count, 0),
+               processed_at = ?
+           FROM image_result AS target
+           LEFT JOIN counts ON counts.image_id = target.image_id
+           WHERE image_result.run_id = ?
+             AND target.run_id = image_result.run_id
+             AND target.image_id = image_result.image_id""",
+        (run_id, threshold, run_id, run_id, threshold, run_id, processed_at, run_id),
     )
-    rows = await cursor.fetchall()
-    return [(row[0], row[1] or 0, row[2] or 0) for row in rows]
@@ -2,26 +2,127 @@
 File processing utilities for uploads.
 - Validates file content
 - Deduplicates via content hash
-- Saves safely (race-proof) under UPLOAD_DIR
+- Saves under UPLOAD_DIR named by content hash (race-free, no name probing)
+- Streams uploads to disk in chunks (memory stays O(chunk), not O(file))
 """
+import asyncio
 import hashlib
+import os
+import tempfile
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Optional, Tuple
 
 import aiosqlite
-import aiofiles
 from fastapi import UploadFile
 
 from utils.security import sanitize_filename
-from config import UPLOAD_DIR
+from config import UPLOAD_DIR, MAX_IMAGE_SIZE
 
+# Read/hash/write granularity for streamed uploads
+_CHUNK_SIZE = 1 << 20  # 1 MiB
 
-async def process_single_file(
-    file: UploadFile,
-    db: aiosqlite.Connection
-) -> Optional[Tuple[str, str, str]]:
+_ALLOWED_EXTS = frozenset({'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif'})
+_ALLOWED_MIMES = frozenset({'image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/bmp', 'image/tiff', 'image/x-tiff'})
+
+# Leading bytes of every accepted format: PNG, JPEG, GIF, BMP, TIFF (little/
+# big endian) and BigTIFF (little/big endian)
+_IMAGE_SIGNATURES = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",
+    b"GIF87a", b"GIF89a",
+    b"BM",
+    b"II*\x00", b"MM\x00*",
+    b"II+\x00", b"MM\x00+",
+)
+
+
+def _stream_to_temp(src: BinaryIO) -> Tuple[Path, str, int]:
+    """
+    Copy an upload into a temp file under UPLOAD_DIR, hashing as it goes.
+
+    Runs in a worker thread, so the reads, digest updates and writes all stay
+    off the event loop. Stops as soon as MAX_IMAGE_SIZE is exceeded, so an
+    oversized file is never fully written. Returns (temp_path, hex_digest, size_in_bytes).
+
+    Raises ValueError, before creating the temp file, if the first chunk
+    doesn't start with a known image signature.
+    """
+    chunk = src.read(_CHUNK_SIZE)
+    if chunk and not chunk.startswith(_IMAGE_SIGNATURES):
+        raise ValueError("Upload is not a supported image format")
+
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as tmp:
+        try:
+            while chunk:
+                size += len(chunk)
+                if size > MAX_IMAGE_SIZE:
+                    raise ValueError(f"Upload exceeds {MAX_IMAGE_SIZE} bytes")
+                digest.update(chunk)
+                tmp.write(chunk)
+                chunk = src.read(_CHUNK_SIZE)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    return Path(tmp.name), digest.hexdigest(), size
+
+
+def hash_file(path: Path) -> str:
     """
-    Returns (file_path, sanitized_filename, file_hash) or None on validation failure.
+    Return the SHA-256 hex digest of a file already on disk.
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _store_by_hash(tmp_path: Path, file_hash: str, suffix: str) -> Path:
+    """
+    Move a streamed temp file to UPLOAD_DIR/<sha256><suffix> and return it.
+
+    Naming files by content means there is nothing to probe for: if the name
+    is taken, the file there already holds these bytes and the temp file is
+    dropped. Concurrent uploads of the same content both land on the same
+    name, and os.replace makes that safe.
+    """
+    dest = UPLOAD_DIR / f"{file_hash}{suffix}"
+    if dest.exists():
+        _discard(tmp_path)
+    else:
+        os.replace(tmp_path, dest)
+    return dest
+
+
+def _reuse_existing(existing: Path, tmp_path: Path) -> bool:
+    """
+    If the stored copy of this content is still on disk, drop the temp file.
+
+    Returns True when the existing file can be reused. Runs in a worker
+    thread so the stat and unlink stay off the event loop.
+    """
+    if not existing.exists():
+        return False
+    _discard(tmp_path)
+    return True
+
+
+def _discard(path: Path) -> None:
+    """Best-effort removal of a temp file that is no longer needed."""
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+async def stream_upload(file: UploadFile) -> Optional[Tuple[Path, str, str, str]]:
+    """
+    Validate an upload and stream its body to a temp file, hashing on the way.
+
+    Needs no database connection, so the (slow) body transfer never holds one.
+    Returns (tmp_path, sanitized_filename, file_hash, file_ext) for
+    store_upload(), or None on validation failure.
     """
     try:
         # 1) filename
@@ -32,58 +133,61 @@ async def process_single_file(
         except Exception:
             return None
 
-        # 2) read content once (simple + predictable)
-        content = await file.read()
-        if not content:
-            return None
-
-        # 3) basic type check by extension and MIME
+        # 2) basic type check by extension and MIME (before touching the body)
         file_ext = Path(sanitized).suffix.lower()
-        allowed_exts = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif'}
-        allowed_mimes = {'image/png', 'image/jpeg', 'image/jpg', 'image/gif', 'image/bmp', 'image/tiff', 'image/x-tiff'}
-        if file_ext not in allowed_exts:
+        if file_ext not in _ALLOWED_EXTS:
+            return None
+        if file.content_type and file.content_type.lower() not in _ALLOWED_MIMES:
+            return None
+        # Size from the multipart headers when known; the stream check below catches the rest
+        if file.size is not None and file.size > MAX_IMAGE_SIZE:
             return None
-        if file.content_type and file.content_type.lower() not in allowed_mimes:
+
+        # 3) stream body to a temp file, hashing for dedupe on the way
+        #    (content that doesn't start with an image signature is rejected
+        #    after the first chunk, without writing anything)
+        tmp_path, file_hash, size = await asyncio.to_thread(_stream_to_temp, file.file)
+        if not size:
+            _discard(tmp_path)
             return None
+        return (tmp_path, sanitized, file_hash, file_ext)
+
+    except Exception:
+        return None
 
-        # 4) hash for dedupe
-        file_hash = hashlib.md5(content).hexdigest()  # fine for dedupe; switch to blake2 if you want
 
-        # 5) check existing by hash (assume default aiosqlite row_factory -> tuples)
-        async with db.execute(
+async def store_upload(
+    db: aiosqlite.Connection,
+    staged: Tuple[Path, str, str, str]
+) -> Optional[Tuple[str, str, str]]:
+    """
+    Give a file from stream_upload() its final place on disk.
+
+    db only serves the duplicate-hash lookup, so a reader connection will do.
+    Returns (file_path, sanitized_filename, file_hash) or None on failure.
+    """
+    tmp_path, sanitized, file_hash, file_ext = staged
+    try:
+        # 4) check existing by hash (assume default aiosqlite row_factory -> tuples)
+        rows = await db.execute_fetchall(
             "SELECT stored_path FROM image WHERE file_hash = ? LIMIT 1",
             (file_hash,)
-        ) as cur:
-            row = await cur.fetchone()
+        )
 
-        if row:
-            existing_path = row[0]  # tuple access; not row["stored_path"] unless row_factory=Row
+        if rows:
+            existing_path = rows[0][0]  # tuple access; not row["stored_path"] unless row_factory=Row
             try:
                 p = Path(existing_path)
-                if p.exists():
+                if await asyncio.to_thread(_reuse_existing, p, tmp_path):
                     return (str(p), sanitized, file_hash)
             except Exception:
                 # invalid/missing on disk -> proceed to save a new copy
                 pass
 
-        # 6) choose a unique destination (race-safe using exclusive create)
-        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-        stem = Path(sanitized).stem
-        suffix = Path(sanitized).suffix or ""
-        counter = 0
-        while True:
-            name = f"{stem}{'' if counter == 0 else f'_{counter}'}{suffix}"
-            dest = UPLOAD_DIR / name
-            try:
-                async with aiofiles.open(dest, "xb") as f:  # 'x' = fail if exists (TOCTOU-safe)
-                    await f.write(content)
-                # success
-                return (str(dest), sanitized, file_hash)
-            except FileExistsError:
-                counter += 1
-                continue
-            except Exception:
-                return None
+        # 5) give the streamed file its final, content-derived name
+        dest = await asyncio.to_thread(_store_by_hash, tmp_path, file_hash, file_ext)
+        return (str(dest), sanitized, file_hash)
 
     except Exception:
+        _discard(tmp_path)
         return None
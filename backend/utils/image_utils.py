@@ -1,15 +1,33 @@
 """
 Image utils: dedup and collection ops (SQLite, aiosqlite).
 - Dedup via UNIQUE(file_hash) and UNIQUE(collection_id, image_id) + INSERT OR IGNORE.
+- Uploads are staged in a temp table with one executemany, then written with
+  set-based INSERT ... SELECT statements (a fixed number of statements per upload).
 """
 
 from __future__ import annotations
+import asyncio
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import List, Tuple
 
 import aiosqlite
 
+from utils.file_processing import hash_file
+
+# Hex length of the MD5 digests stored before uploads switched to SHA-256
+_LEGACY_HASH_LENGTH = 32
+
+# Per-connection staging table for uploads (temp_store=MEMORY keeps it in RAM)
+_SQL_CREATE_STAGE = """
+    CREATE TEMP TABLE IF NOT EXISTS upload_stage (
+        seq         INTEGER PRIMARY KEY,
+        filename    TEXT NOT NULL,
+        stored_path TEXT NOT NULL,
+        file_hash   TEXT NOT NULL
+    )
+"""
+
 
 async def add_multiple_images_optimized(
     db: aiosqlite.Connection,
@@ -21,6 +39,9 @@ async def add_multiple_images_optimized(
     """
     Add many images to a collection with clear, sequential SQL steps.
 
+    The upload is staged once, then every step is a single set-based statement
+    regardless of how many images were uploaded.
+
     Returns: (image_ids (in input order), added_count, duplicate_count_in_collection, duplicate_image_ids)
       - duplicate_count counts images already linked to this collection *before* this call.
     """
@@ -28,52 +49,101 @@ async def add_multiple_images_optimized(
         return ([], 0, 0, [])
 
     now = datetime.now(timezone.utc).isoformat()
-    image_ids: List[int] = []
 
-    await db.execute("BEGIN")
+    # IMMEDIATE takes the write lock up front (waiting out busy_timeout for a
+    # run's connection) instead of failing on the upgrade mid-transaction
+    await db.execute("BEGIN IMMEDIATE")
     try:
-        # 1) Ensure each image exists and collect IDs in input order.
-        for file_path, filename, file_hash in image_data:
-            await db.execute(
-                "INSERT OR IGNORE INTO image (filename, stored_path, file_hash) VALUES (?, ?, ?)",
-                (filename or Path(file_path).name, file_path, file_hash),
-            )
-            async with db.execute(
-                "SELECT image_id FROM image WHERE file_hash = ? LIMIT 1",
-                (file_hash,),
-            ) as cur:
-                row = await cur.fetchone()
-            if not row:
-                raise RuntimeError(f"Failed to resolve image_id for hash {file_hash}")
-            image_ids.append(row[0])
-
-        # 2) Check which unique image IDs were already linked before this call.
-        unique_ids = sorted(set(image_ids))
-        already_linked = set()
-        for image_id in unique_ids:
-            async with db.execute(
-                "SELECT 1 FROM collection_image WHERE collection_id = ? AND image_id = ? LIMIT 1",
-                (collection_id, image_id),
-            ) as cur:
-                if await cur.fetchone():
-                    already_linked.add(image_id)
+        # 0) Stage the upload (seq keeps input order).
+        await db.execute(_SQL_CREATE_STAGE)
+        await db.execute("DELETE FROM temp.upload_stage")
+        await db.executemany(
+            "INSERT INTO temp.upload_stage (filename, stored_path, file_hash) VALUES (?, ?, ?)",
+            [
+                (filename or Path(file_path).name, file_path, file_hash)
+                for file_path, filename, file_hash in image_data
+            ],
+        )
+
+        # 1) Ensure each image exists (first staged row wins for repeated hashes).
+        await db.execute(
+            """INSERT OR IGNORE INTO image (filename, stored_path, file_hash)
+               SELECT filename, stored_path, file_hash
+               FROM temp.upload_stage
+               ORDER BY seq"""
+        )
+
+        # 2) Resolve IDs in input order, plus whether each was already linked.
+        async with db.execute(
+            """SELECT i.image_id, ci.image_id IS NOT NULL AS linked
+               FROM temp.upload_stage s
+               JOIN image i ON i.file_hash = s.file_hash
+               LEFT JOIN collection_image ci
+                 ON ci.collection_id = ? AND ci.image_id = i.image_id
+               ORDER BY s.seq""",
+            (collection_id,),
+        ) as cur:
+            rows = await cur.fetchall()
+
+        if len(rows) != len(image_data):
+            raise RuntimeError("Failed to resolve image_id for every uploaded hash")
 
+        # One pass over the rows for ids, already-linked ids and their count
+        image_ids: List[int] = []
+        already_linked = set()
+        duplicate_count = 0
+        for image_id, linked in rows:
+            image_ids.append(image_id)
+            if linked:
+                already_linked.add(image_id)
+                duplicate_count += 1
         duplicate_image_ids = sorted(already_linked)
-        duplicate_count = sum(1 for image_id in image_ids if image_id in already_linked)
 
         # 3) Link only IDs that were not already linked.
-        added_count = 0
-        for image_id in unique_ids:
-            if image_id in already_linked:
-                continue
-            await db.execute(
-                "INSERT INTO collection_image (collection_id, image_id, added_at) VALUES (?, ?, ?)",
-                (collection_id, image_id, now),
-            )
-            added_count += 1
+        cursor = await db.execute(
+            """INSERT OR IGNORE INTO collection_image (collection_id, image_id, added_at)
+               SELECT DISTINCT ?, i.image_id, ?
+               FROM temp.upload_stage s
+               JOIN image i ON i.file_hash = s.file_hash
+               ORDER BY i.image_id""",
+            (collection_id, now),
+        )
+        added_count = cursor.rowcount
 
+        await db.execute("DELETE FROM temp.upload_stage")
         await db.commit()
         return (image_ids, added_count, duplicate_count, duplicate_image_ids)
     except Exception:
         await db.rollback()
         raise
+
+
+async def upgrade_legacy_hashes(db: aiosqlite.Connection) -> int:
+    """
+    Re-hash images still stored with a legacy MD5 file_hash as SHA-256.
+
+    New uploads are hashed with SHA-256, so legacy rows would never match a
+    re-upload of the same file. Rows whose file is missing on disk keep their
+    old hash. Returns the number of rows upgraded.
+    """
+    async with db.execute(
+        "SELECT image_id, stored_path FROM image WHERE length(file_hash) = ?",
+        (_LEGACY_HASH_LENGTH,),
+    ) as cur:
+        rows = await cur.fetchall()
+
+    upgraded = 0
+    for image_id, stored_path in rows:
+        try:
+            file_hash = await asyncio.to_thread(hash_file, Path(stored_path))
+        except OSError:
+            continue
+        cursor = await db.execute(
+            "UPDATE OR IGNORE image SET file_hash = ? WHERE image_id = ?",
+            (file_hash, image_id),
+        )
+        upgraded += cursor.rowcount
+
+    if rows:
+        await db.commit()
+    return upgraded
@@ -1,9 +1,9 @@
 # Model utilities package
 # Exports for backward compatibility and convenience
 
-from .db import get_all_models, get_model
+from .db import get_all_models, get_model, get_model_by_hash, upsert_model, register_models, set_model_hashes
 from .loader import load_model
 from .inference import run_inference_on_image
 
-__all__ = ['get_all_models', 'get_model', 'load_model', 'run_inference_on_image']
+__all__ = ['get_all_models', 'get_model', 'get_model_by_hash', 'upsert_model', 'register_models', 'set_model_hashes', 'load_model', 'run_inference_on_image']
 
@@ -11,10 +11,9 @@ async def get_all_models(db: aiosqlite.Connection):
     Returns:
         List of model rows
     """
-    cursor = await db.execute(
+    return await db.execute_fetchall(
         "SELECT * FROM model ORDER BY model_id DESC"
     )
-    return await cursor.fetchall()
 
 
 async def get_model(db: aiosqlite.Connection, model_id: int):
@@ -28,8 +27,98 @@ async def get_model(db: aiosqlite.Connection, model_id: int):
     Returns:
         Row with model data, or None if not found
     """
-    cursor = await db.execute(
+    rows = await db.execute_fetchall(
         "SELECT * FROM model WHERE model_id = ?",
         (model_id,)
     )
-    return await cursor.fetchone()
+    return rows[0] if rows else None
+
+
+async def get_model_by_hash(db: aiosqlite.Connection, file_hash: str):
+    """
+    Get the model whose uploaded weights have this SHA-256 hash.
+    
+    Args:
+        db: Database connection
+        file_hash: SHA-256 hex digest of the weights file
+        
+    Returns:
+        Row with model data, or None if no upload matches
+    """
+    rows = await db.execute_fetchall(
+        "SELECT * FROM model WHERE file_hash = ? LIMIT 1",
+        (file_hash,)
+    )
+    return rows[0] if rows else None
+
+
+async def upsert_model(
+    db: aiosqlite.Connection,
+    name: str,
+    model_type: str,
+    weights_path: str,
+    file_hash: str | None = None,
+):
+    """
+    Register a model unless one with the same weights_path already exists.
+    
+    Single INSERT ... ON CONFLICT DO NOTHING statement (relies on the UNIQUE
+    index on model.weights_path), so there is no check-then-insert race.
+    Does not commit; the caller owns the transaction.
+    
+    Args:
+        db: Database connection
+        name: Display name for the model
+        model_type: Canonical model type ("YOLO" or "FASTRCNN")
+        weights_path: Path to the weights file
+        file_hash: SHA-256 of the weights file, if known
+        
+    Returns:
+        New model_id, or None if the weights_path was already registered
+    """
+    cursor = await db.execute(
+        """INSERT INTO model (name, type, weights_path, file_hash)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(weights_path) DO NOTHING
+           RETURNING model_id""",
+        (name, model_type, weights_path, file_hash)
+    )
+    row = await cursor.fetchone()
+    return row[0] if row else None
+
+
+async def register_models(db: aiosqlite.Connection, models) -> None:
+    """
+    Register many models in one executemany call (used for startup seeding).
+    
+    Same ON CONFLICT(weights_path) DO NOTHING rule as upsert_model, so files
+    that are already registered are skipped. Does not commit; the caller owns
+    the transaction.
+    
+    Args:
+        db: Database connection
+        models: Iterable of (name, model_type, weights_path, file_hash) tuples
+    """
+    await db.executemany(
+        """INSERT INTO model (name, type, weights_path, file_hash)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(weights_path) DO NOTHING""",
+        models
+    )
+
+
+async def set_model_hashes(db: aiosqlite.Connection, hashes) -> None:
+    """
+    Record the SHA-256 of models registered before their hash was known.
+    
+    Only fills in missing hashes. Does not commit; the caller owns the
+    transaction.
+    
+    Args:
+        db: Database connection
+        hashes: Iterable of (file_hash, weights_path) tuples
+    """
+    await db.executemany(
+        "UPDATE model SET file_hash = ? WHERE weights_path = ? AND file_hash IS NULL",
+        hashes
+    )
@@ -3,7 +3,9 @@ Run utilities for processing inference runs
 """
 from .collection_processor import process_collection_run
 from .image_processor import process_image_for_run
-from .db import get_or_create_run, get_run, update_run_status
+from .db import get_or_create_run, get_run, update_run_status, try_cancel_run
+from .run_queue import enqueue_run, start_run_worker, stop_run_worker
+from .snapshots import get_run_snapshot, drop_run_snapshot, subscribe_run, unsubscribe_run
 
 __all__ = [
     'process_collection_run',
@@ -11,5 +13,13 @@ __all__ = [
     'get_or_create_run',
     'get_run',
     'update_run_status',
+    'try_cancel_run',
+    'enqueue_run',
+    'start_run_worker',
+    'stop_run_worker',
+    'get_run_snapshot',
+    'drop_run_snapshot',
+    'subscribe_run',
+    'unsubscribe_run',
 ]
 
@@ -13,7 +13,6 @@ Important behavior:
 - Image processing is intentionally sequential to reduce CPU spikes and
   simplify runtime behavior.
 """
-import asyncio
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -22,8 +21,10 @@ import aiosqlite
 from utils.collection_utils import get_collection_images
 from utils.model_utils.db import get_model
 from utils.model_utils.loader import load_model
-from .db import get_run, update_run_status
+from .db import get_run, mark_run_running, update_run_status
 from .image_processor import process_image_for_run
+from .inference_thread import run_in_inference_thread
+from .snapshots import start_run_snapshot, update_run_snapshot, drop_run_snapshot
 
 
 async def _fail(db: aiosqlite.Connection, run_id: int, message: str, status: str = 'failed') -> None:
@@ -33,35 +34,44 @@ async def _fail(db: aiosqlite.Connection, run_id: int, message: str, status: str
     We never want error-reporting itself to crash the task, so this function
     intentionally suppresses secondary exceptions from status updates.
     """
+    drop_run_snapshot(run_id)
     try:
         await update_run_status(db, run_id, status, message)
     except Exception:
         pass
 
 
+async def _is_cancelled(db: aiosqlite.Connection, run_id: int) -> bool:
+    """True once POST /runs/{run_id}/stop has marked the run cancelled."""
+    rows = await db.execute_fetchall("SELECT status FROM run WHERE run_id = ?", (run_id,))
+    return bool(rows) and rows[0][0] == 'cancelled'
+
+
 async def _setup_run_and_load_model(db: aiosqlite.Connection, run_id: int):
     """
     Prepare run metadata and load the configured model.
 
     Steps:
-    - Fetch run row and mark status as running.
+    - Mark the run as running (unless it was stopped in the meantime).
     - Resolve model metadata (weights path + model type).
     - Validate weights file exists.
     - Load model in a worker thread so the event loop stays responsive.
 
     Returns:
         (model_device, collection_id, threshold, model_type) on success.
-        None when setup fails (and run is marked failed).
+        None when setup fails (and run is marked failed) or the run was
+        stopped before it started.
     """
-    run = await get_run(db, run_id)
+    run = await mark_run_running(db, run_id)
     if not run:
-        await _fail(db, run_id, "Run not found in database")
+        # Gone, or stopped before it got going: the stop already wrote the
+        # final status, so there is nothing to record
         return None
     
     collection_id = run['collection_id']
     model_id = run['model_id']
     threshold = run['threshold']
-    await update_run_status(db, run_id, 'running')
+    start_run_snapshot(dict(run))
     
     model_row = await get_model(db, model_id)
     if not model_row:
@@ -75,9 +85,10 @@ async def _setup_run_and_load_model(db: aiosqlite.Connection, run_id: int):
         await _fail(db, run_id, f"Model weights file not found: {weights_path}")
         return None
     
-    # PyTorch model loading is blocking/CPU-heavy; push it off the event loop.
+    # PyTorch model loading is blocking/CPU-heavy; push it off the event loop
+    # onto the same thread that will run inference.
     try:
-        model_device = await asyncio.to_thread(load_model, weights_path, model_type)
+        model_device = await run_in_inference_thread(load_model, weights_path, model_type)
     except Exception as e:
         await _fail(db, run_id, f"Failed to load model: {e}")
         return None
@@ -127,8 +138,9 @@ async def _handle_all_images_processed(db: aiosqlite.Connection, run_id: int, to
     Finalize a run when there is nothing left to process.
 
     This path is hit when every image in the collection already has an
-    image_result row for this run_id.
+    image_result row for this run_id. A cancelled run keeps its status.
     """
+    drop_run_snapshot(run_id)
     cursor = await db.execute(
         """SELECT SUM(live_mussel_count) FROM image_result WHERE run_id = ?""",
         (run_id,)
@@ -144,7 +156,7 @@ async def _handle_all_images_processed(db: aiosqlite.Connection, run_id: int, to
                total_images = ?,
                processed_count = ?,
                live_mussel_count = ?
-           WHERE run_id = ?""",
+           WHERE run_id = ? AND status != 'cancelled'""",
         ('completed', now, total_images, total_images, total_live_count, run_id)
     )
     await db.commit()
@@ -162,13 +174,20 @@ async def _process_single_images(
     """
     Process (run inference on) images sequentially (one image at a time).
 
+    The run's status is re-read before each image, so a run stopped part-way
+    ends after the image in flight instead of working through the rest.
+
     Returns:
-        List of (image_id, success, live_count, dead_count) tuples
+        List of (image_id, success, live_count, dead_count) tuples, or None
+        if the run was cancelled
     """
     results = []
     processed_count = 0
 
     for image in images:
+        if await _is_cancelled(db, run_id):
+            return None
+
         # Pull safe defaults so per-image failures are captured cleanly.
         image_id = image['image_id']
         image_path = image.get('stored_path', 'unknown')
@@ -179,7 +198,9 @@ async def _process_single_images(
         # - detection writes
         # - thresholded counts
         # - image_result writes
+        # and leaves its writes uncommitted for the progress update below.
         result = await process_image_for_run(
+            db,
             run_id,
             image_id,
             image_path,
@@ -191,12 +212,14 @@ async def _process_single_images(
 
         processed_count += 1
         # Persist incremental progress after each image so polling clients
-        # get accurate progress updates during long runs.
+        # get accurate progress updates during long runs. The image's
+        # detections and result land in the same commit.
         await db.execute(
             "UPDATE run SET processed_count = ? WHERE run_id = ?",
             (processed_count + images_already_done, run_id),
         )
         await db.commit()
+        update_run_snapshot(run_id, processed_count=processed_count + images_already_done)
     
     return results
 
@@ -214,11 +237,13 @@ async def _finalize_run(
     Status rules:
     - completed: every image processed in this invocation succeeded.
     - completed_with_errors: at least one image failed in this invocation.
+    - a run cancelled in the meantime keeps its 'cancelled' status.
 
     total_images is stored as:
         images_already_done + images_processed_in_this_run
     so resumed runs still report full collection progress.
     """
+    drop_run_snapshot(run_id)
     successes = [result for result in results if result[1]]
     successful_images = len(successes)
     
@@ -243,7 +268,7 @@ async def _finalize_run(
                total_images = ?,
                processed_count = ?,
                live_mussel_count = ?
-           WHERE run_id = ?""",
+           WHERE run_id = ? AND status != 'cancelled'""",
         (final_status, now, total_expected, total_expected, total_live_count, run_id)
     )
     await db.commit()
@@ -292,6 +317,7 @@ async def process_collection_run(db: aiosqlite.Connection, run_id: int):
             (total_images, images_already_done, run_id)
         )
         await db.commit()
+        update_run_snapshot(run_id, total_images=total_images, processed_count=images_already_done)
         
         results = await _process_single_images(
             db,
@@ -302,6 +328,9 @@ async def process_collection_run(db: aiosqlite.Connection, run_id: int):
             model_type,
             images_already_done,
         )
+        if results is None:
+            # Stopped part-way; the stop request already wrote the final status
+            return
         
         # Finalize: Aggregate results and update status
         await _finalize_run(db, run_id, results, len(images_to_process), images_already_done)
@@ -11,11 +11,14 @@ async def get_or_create_run(
     collection_id: int,
     model_id: int,
     threshold: float = 0.5
-) -> tuple[int, bool]:
+) -> tuple[aiosqlite.Row, bool]:
     """
     Get existing run or create new one for this collection+model+threshold combo.
     A run is uniquely identified by (collection_id, model_id, threshold).
     
+    Every path hands back the full run row (SELECT * / RETURNING *), so callers
+    don't need a second get_run round-trip.
+    
     Args:
         db: Database connection
         collection_id: Collection ID to run inference on
@@ -23,11 +26,11 @@ async def get_or_create_run(
         threshold: Threshold score for classification (default 0.5)
         
     Returns:
-        Tuple of (run_id, was_created) - was_created is True if new run created, False if existing
+        Tuple of (run_row, was_created) - was_created is True if new run created, False if existing
     """
     # Check if run exists for this configuration
     cursor = await db.execute(
-        """SELECT run_id, status FROM run 
+        """SELECT * FROM run 
            WHERE collection_id = ? AND model_id = ? 
            AND ABS(threshold - ?) < 0.001
            LIMIT 1""",
@@ -36,27 +39,29 @@ async def get_or_create_run(
     row = await cursor.fetchone()
     
     if row:
-        run_id, status = row[0], row[1]
         # Only reset if not currently running (avoid duplicate concurrent processing)
-        if status not in ('pending', 'running'):
-            await db.execute(
+        if row['status'] not in ('pending', 'running'):
+            cursor = await db.execute(
                 """UPDATE run SET status = 'pending', started_at = ? 
-                   WHERE run_id = ?""",
-                (datetime.now(timezone.utc).isoformat(), run_id)
+                   WHERE run_id = ?
+                   RETURNING *""",
+                (datetime.now(timezone.utc).isoformat(), row['run_id'])
             )
+            row = await cursor.fetchone()
             await db.commit()
-        return (run_id, False)
+        return (row, False)
     
     # Create new run
     now = datetime.now(timezone.utc).isoformat()
     cursor = await db.execute(
         """INSERT INTO run (collection_id, model_id, started_at, status, threshold)
-           VALUES (?, ?, ?, ?, ?)""",
+           VALUES (?, ?, ?, ?, ?)
+           RETURNING *""",
         (collection_id, model_id, now, 'pending', threshold)
     )
-    run_id = cursor.lastrowid
+    row = await cursor.fetchone()
     await db.commit()
-    return (run_id, True)
+    return (row, True)
 
 
 async def get_run(
@@ -73,11 +78,11 @@ async def get_run(
     Returns:
         Row with run data, or None if not found
     """
-    cursor = await db.execute(
+    rows = await db.execute_fetchall(
         "SELECT * FROM run WHERE run_id = ?",
         (run_id,)
     )
-    return await cursor.fetchone()
+    return rows[0] if rows else None
 
 
 async def update_run_status(
@@ -117,3 +122,62 @@ async def update_run_status(
     query = f"UPDATE run SET {', '.join(updates)} WHERE run_id = ?"
     await db.execute(query, values)
     await db.commit()
+
+
+async def mark_run_running(
+    db: aiosqlite.Connection,
+    run_id: int
+) -> Optional[aiosqlite.Row]:
+    """
+    Mark a run 'running' if it is still pending (or running, when resumed
+    after a restart).
+    
+    Like try_cancel_run, the status check and the update are a single
+    statement, so a stop that lands just before this is never overwritten.
+    
+    Args:
+        db: Database connection
+        run_id: Run ID
+        
+    Returns:
+        The updated run row, or None if the run doesn't exist or was
+        cancelled/finished in the meantime
+    """
+    rows = await db.execute_fetchall(
+        """UPDATE run SET status = 'running'
+           WHERE run_id = ? AND status IN ('pending', 'running')
+           RETURNING *""",
+        (run_id,)
+    )
+    await db.commit()
+    return rows[0] if rows else None
+
+
+async def try_cancel_run(
+    db: aiosqlite.Connection,
+    run_id: int,
+    error_msg: str
+) -> Optional[aiosqlite.Row]:
+    """
+    Mark a run 'cancelled' if it is still pending or running.
+    
+    The status check and the update are a single statement, so a run that
+    finishes in the meantime is never flipped to cancelled.
+    
+    Args:
+        db: Database connection
+        run_id: Run ID
+        error_msg: Message stored on the cancelled run
+        
+    Returns:
+        The updated run row, or None if the run doesn't exist or had
+        already reached another status
+    """
+    rows = await db.execute_fetchall(
+        """UPDATE run SET status = 'cancelled', error_msg = ?
+           WHERE run_id = ? AND status IN ('pending', 'running')
+           RETURNING *""",
+        (error_msg, run_id)
+    )
+    await db.commit()
+    return rows[0] if rows else None
@@ -0,0 +1,51 @@
+"""
+Dedicated thread for model loading and inference.
+
+Inference saturates the CPU for the whole length of a run. Running it through
+asyncio.to_thread would put it on the default executor that request handlers
+also use (upload hashing, model file copies), and at the same OS priority as
+the SQLite connection threads serving status polls.
+
+Instead runs use one named thread of their own, lowered to
+INFERENCE_THREAD_NICE on Linux, where a native thread id can be passed to
+setpriority() as a pid to renice just that thread. Other platforms have no
+per-thread equivalent (there the call would renice the whole process or an
+unrelated one), so the thread just runs at normal priority. Lowering
+priority needs no privileges, unlike raising the database threads above it.
+PyTorch's intra-op worker threads are spawned from this thread on first use,
+so they inherit its priority.
+"""
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, TypeVar
+
+from config import INFERENCE_THREAD_NICE
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _lower_priority() -> None:
+    # PRIO_PROCESS with a thread id applies to that thread only on Linux
+    if not INFERENCE_THREAD_NICE or not sys.platform.startswith("linux"):
+        return
+    try:
+        tid = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + INFERENCE_THREAD_NICE)
+    except (OSError, OverflowError):
+        pass
+
+
+async def run_in_inference_thread(func: Callable[..., T], *args) -> T:
+    """Run func(*args) on the inference thread and await its result."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="inference", initializer=_lower_priority
+        )
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(func, *args))
@@ -0,0 +1,109 @@
+"""
+In-process queue for inference runs.
+
+Runs are long (model load + one inference per image), so instead of each
+start request spawning its own background task, run_ids go onto a single
+asyncio.Queue drained by one worker task:
+- a run that is already queued or in progress is never scheduled twice
+- runs execute one after another, so two models never compete for the CPU/GPU
+- runs left pending/running when the backend stopped are queued again on
+  startup (process_collection_run resumes from the images already done)
+- a run started again while it is still in flight (e.g. stopped, then
+  restarted before the worker let go of it) is queued once more when the
+  current pass ends, instead of being dropped
+"""
+import asyncio
+from typing import Optional, Set
+
+from db import connect_db, get_db
+from .collection_processor import process_collection_run
+from .db import get_run
+from .snapshots import drop_run_snapshot
+
+_queue: Optional[asyncio.Queue] = None
+_queued: Set[int] = set()  # run_ids waiting or in progress
+_rerun: Set[int] = set()  # in-flight run_ids started again meanwhile
+_worker: Optional[asyncio.Task] = None
+
+
+async def _run_worker() -> None:
+    """Process queued runs one at a time, each on a private connection."""
+    while True:
+        run_id = await _queue.get()
+        try:
+            # The run holds its connection for its whole duration, so it must
+            # not use the pooled writer
+            async with connect_db() as db:
+                run = await get_run(db, run_id)
+                # Cancelled while waiting in the queue, or already finished
+                # by an earlier pass (a re-queued run that didn't need one)
+                if run and run['status'] in ('pending', 'running'):
+                    await process_collection_run(db, run_id)
+        except Exception:
+            # process_collection_run records failures on the run row itself;
+            # never let one bad run stop the worker
+            pass
+        finally:
+            drop_run_snapshot(run_id)
+            if run_id in _rerun:
+                # Started again while in flight: keep it queued for another pass
+                _rerun.discard(run_id)
+                _queue.put_nowait(run_id)
+            else:
+                _queued.discard(run_id)
+            _queue.task_done()
+
+
+def _ensure_worker() -> None:
+    global _queue, _worker
+    if _queue is None:
+        _queue = asyncio.Queue()
+    if _worker is None or _worker.done():
+        _worker = asyncio.create_task(_run_worker())
+
+
+def enqueue_run(run_id: int) -> bool:
+    """
+    Schedule a run for processing.
+
+    Returns False if the run is already queued or in progress; it then gets
+    one more pass after the current one, so a restart is never lost.
+    """
+    _ensure_worker()
+    if run_id in _queued:
+        _rerun.add(run_id)
+        return False
+    _queued.add(run_id)
+    _queue.put_nowait(run_id)
+    return True
+
+
+async def start_run_worker() -> None:
+    """
+    Start the worker and re-queue runs interrupted by the last shutdown.
+    """
+    _ensure_worker()
+    async with get_db(readonly=True) as db:
+        cursor = await db.execute(
+            "SELECT run_id FROM run WHERE status IN ('pending', 'running') ORDER BY run_id"
+        )
+        for row in await cursor.fetchall():
+            enqueue_run(row[0])
+
+
+async def stop_run_worker() -> None:
+    """
+    Stop the worker. Unfinished runs stay pending/running in the database
+    and are picked up again by the next start_run_worker().
+    """
+    global _queue, _worker
+    if _worker is not None:
+        _worker.cancel()
+        try:
+            await _worker
+        except asyncio.CancelledError:
+            pass
+    _worker = None
+    _queue = None
+    _queued.clear()
+    _rerun.clear()
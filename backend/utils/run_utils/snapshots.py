@@ -0,0 +1,69 @@
+"""
+In-process snapshots of runs that are in progress.
+
+The frontend polls GET /api/runs/{run_id} for the whole length of a run. The
+run worker lives in this process, so while a run is going it keeps a copy of
+the run row here, mirroring each progress write it makes to the database, and
+polls are answered from memory.
+
+A snapshot only exists between the run being marked running and its first
+terminal write (completed/failed/cancelled); outside that window callers
+read the database as usual.
+
+Clients of GET /api/runs/{run_id}/events subscribe here instead of polling.
+Each subscriber gets a one-slot queue holding the latest snapshot (older
+ones are superseded, so a slow client never builds up a backlog), and None
+once the snapshot is dropped, meaning "read the final row from the database".
+"""
+import asyncio
+from typing import Dict, Optional, Set
+
+_snapshots: Dict[int, dict] = {}
+_subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+
+def _notify(run_id: int, snapshot: Optional[dict]) -> None:
+    """Hand the latest snapshot (or None) to every subscriber of the run."""
+    for queue in _subscribers.get(run_id, ()):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(None if snapshot is None else dict(snapshot))
+
+
+def start_run_snapshot(run: dict) -> None:
+    """Begin tracking a run from its row (as dict) with status 'running'."""
+    snapshot = _snapshots[run['run_id']] = {**run, 'status': 'running'}
+    _notify(run['run_id'], snapshot)
+
+
+def update_run_snapshot(run_id: int, **fields) -> None:
+    """Mirror a progress write. No-op once the snapshot has been dropped."""
+    snapshot = _snapshots.get(run_id)
+    if snapshot is not None:
+        snapshot.update(fields)
+        _notify(run_id, snapshot)
+
+
+def drop_run_snapshot(run_id: int) -> None:
+    """Stop serving the run from memory (it is finishing or was stopped)."""
+    _snapshots.pop(run_id, None)
+    _notify(run_id, None)
+
+
+def get_run_snapshot(run_id: int) -> Optional[dict]:
+    return _snapshots.get(run_id)
+
+
+def subscribe_run(run_id: int) -> asyncio.Queue:
+    """Register for the run's snapshot updates; pair with unsubscribe_run()."""
+    queue = asyncio.Queue(maxsize=1)
+    _subscribers.setdefault(run_id, set()).add(queue)
+    return queue
+
+
+def unsubscribe_run(run_id: int, queue: asyncio.Queue) -> None:
+    queues = _subscribers.get(run_id)
+    if queues is not None:
+        queues.discard(queue)
+        if not queues:
+            del _subscribers[run_id]
@@ -1,11 +1,16 @@
-import { useState, useEffect, startTransition } from 'react';
+import { useState, useEffect, useRef, startTransition } from 'react';
 import { useQuery } from '@tanstack/react-query';
-import { getCollection } from '@/lib/api';
+import { getCollection, getRunEventsUrl } from '@/lib/api';
+
+// Minimum gap between collection refetches triggered by run progress events
+const RUN_EVENT_REFETCH_MS = 1000;
 
 export function useCollectionData(collectionIdParam: number, selectedModelId?: number | null) {
   const [threshold, setThreshold] = useState(0.5);
   const [manualLoading, setManualLoading] = useState(false);
   const [manualError, setManualError] = useState<string | null>(null);
+  // True while a run progress stream is open; polling is the fallback
+  const [streaming, setStreaming] = useState(false);
 
   // Use react-query for collection data fetching with automatic polling
   const {
@@ -20,7 +25,8 @@ export function useCollectionData(collectionIdParam: number, selectedModelId?: n
     refetchInterval: (query) => {
       const data = query.state.data as Awaited<ReturnType<typeof getCollection>> | undefined;
       const runStatus = data?.latest_run?.status;
-      if (runStatus === 'running' || runStatus === 'pending') {
+      // Progress events drive refetches while the stream is open
+      if (!streaming && (runStatus === 'running' || runStatus === 'pending')) {
         return 1000;
       }
       return false;
@@ -29,6 +35,52 @@ export function useCollectionData(collectionIdParam: number, selectedModelId?: n
     gcTime: 30000,
   });
 
+  // While the latest run is active, refetch when it reports progress instead
+  // of polling on a timer. Events can arrive faster than once a second, so
+  // refetches are throttled with a trailing call for the last update.
+  const activeRunId =
+    queryData?.latest_run && (queryData.latest_run.status === 'running' || queryData.latest_run.status === 'pending')
+      ? queryData.latest_run.run_id
+      : null;
+  const refetchTimer = useRef<ReturnType<typeof setTimeout> | null>(null);
+  const lastRefetchAt = useRef(0);
+
+  useEffect(() => {
+    if (!activeRunId || typeof EventSource === 'undefined') {
+      return;
+    }
+
+    const source = new EventSource(getRunEventsUrl(activeRunId));
+    const throttledRefetch = () => {
+      if (refetchTimer.current) return;
+      const wait = Math.max(0, lastRefetchAt.current + RUN_EVENT_REFETCH_MS - Date.now());
+      refetchTimer.current = setTimeout(() => {
+        refetchTimer.current = null;
+        lastRefetchAt.current = Date.now();
+        refetch({ cancelRefetch: false });
+      }, wait);
+    };
+
+    source.onopen = () => setStreaming(true);
+    source.onmessage = throttledRefetch;
+    source.onerror = () => {
+      // The server closes the stream once the run finishes; either way, stop
+      // here and let polling take over until the refetch sees the final status
+      source.close();
+      setStreaming(false);
+      throttledRefetch();
+    };
+
+    return () => {
+      source.close();
+      setStreaming(false);
+      if (refetchTimer.current) {
+        clearTimeout(refetchTimer.current);
+        refetchTimer.current = null;
+      }
+    };
+  }, [activeRunId, refetch]);
+
   // Update threshold when latest run changes
   useEffect(() => {
     if (queryData?.latest_run?.threshold !== null && queryData?.latest_run?.threshold !== undefined) {
@@ -321,6 +321,17 @@ export async function getRun(runId: number) {
   return response.data;
 }
 
+/**
+ * URL of a run's Server-Sent Events progress stream (for EventSource)
+ */
+export function getRunEventsUrl(runId: number) {
+  const id = Number(runId);
+  if (isNaN(id) || id <= 0 || !Number.isInteger(id)) {
+    throw new Error('Invalid run ID');
+  }
+  return `${API_BASE}/api/runs/${id}/events`;
+}
+
 /**
  * Stop/cancel a running inference run
  */